@@ -0,0 +1,312 @@
+"""
+Admission control in front of the model: priority lanes, bounded queues
+and deadline-aware load shedding.
+
+Nothing here runs unless ai_service.py is started with AI_ADMISSION=1. Each
+/analyze* request then needs one of ``concurrency`` slots before it may run.
+Requests belong to a lane (``interactive`` or ``bulk``) by route. The
+``X-Priority`` header may move a request to a lower lane; moving it up
+needs the admin token. Waiting requests are granted slots
+strictly by lane priority, FIFO within a lane. Each lane also caps how many
+slots it may hold at once, so a backfill of large batches can never occupy
+the slots interactive users need.
+
+A request may carry a deadline (``X-Deadline-Ms``, milliseconds from
+arrival). A request that has to queue gets an estimated queue wait, from
+the requests ahead of it and the lane's recent service time. If the
+estimated finish is past the deadline, the request is rejected straight
+away instead of wasting compute on an answer nobody will read. The
+shedding rules:
+
+- lane queue full: 429;
+- deadline can't be met on arrival, or passed while queued: 503.
+
+Both carry a ``Retry-After`` with the estimated time for the queue to drain.
+"""
+
+import collections
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+PRIORITY_HEADER = 'X-Priority'
+DEADLINE_HEADER = 'X-Deadline-Ms'
+
+# Smoothing of the per-lane service time estimate
+SERVICE_TIME_ALPHA = 0.2
+
+# Longest X-Deadline-Ms accepted; anything longer is no deadline at all
+MAX_DEADLINE_MS = 3600 * 1000
+
+
+class Rejected(Exception):
+    """A request shed by admission control"""
+
+    def __init__(self, status, reason, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lane:
+    """One priority class: slot cap, queue bound, default deadline and statistics"""
+
+    def __init__(self, name, max_active, max_queue, default_deadline_ms=0):
+        self.name = name
+        self.max_active = max(1, int(max_active))
+        self.max_queue = max(0, int(max_queue))
+        self.default_deadline = default_deadline_ms / 1000 if default_deadline_ms else None
+
+        self.active = 0
+        self.queue = collections.deque()
+        # Seconds a request holds its slot, smoothed; None until the first one finishes
+        self.service_time = None
+        self.admitted = 0
+        self.shed = collections.Counter()
+
+
+class _Waiter:
+    __slots__ = ('deadline', 'event', 'granted')
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.event = threading.Event()
+        self.granted = False
+
+
+class Ticket:
+    """A granted slot; pass it back to AdmissionController.release()"""
+
+    __slots__ = ('lane', 'arrived', 'started')
+
+    def __init__(self, lane, arrived, started):
+        self.lane = lane
+        self.arrived = arrived
+        self.started = started
+
+    @property
+    def waited(self):
+        return self.started - self.arrived
+
+
+class AdmissionController:
+    """Grants model slots by lane priority and sheds requests that can't finish in time"""
+
+    def __init__(self, lanes, concurrency):
+        # Lanes in priority order, highest first
+        self.lanes = {lane.name: lane for lane in lanes}
+        self._order = list(lanes)
+        self.concurrency = max(1, int(concurrency))
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _can_start(self, lane):
+        return self._active < self.concurrency and lane.active < lane.max_active
+
+    def _ahead(self, lane):
+        """Requests queued in this lane and every lane above it"""
+        ahead = 0
+        for other in self._order:
+            ahead += len(other.queue)
+            if other is lane:
+                return ahead
+        return ahead
+
+    def _estimated_wait(self, lane, ahead):
+        """Seconds until a request with `ahead` queued requests before it gets a slot"""
+        if ahead == 0 and self._can_start(lane):
+            return 0.0
+        slots = min(self.concurrency, lane.max_active)
+        return (ahead // slots + 1) * (lane.service_time or 0.0)
+
+    def _retry_after(self, lane):
+        return max(1, math.ceil(self._estimated_wait(lane, self._ahead(lane))))
+
+    def _grant(self, lane, waiter):
+        self._active += 1
+        lane.active += 1
+        lane.admitted += 1
+        waiter.granted = True
+        waiter.event.set()
+
+    def _dispatch(self, now):
+        """Hand free slots to the head waiters, highest-priority lane first"""
+        for lane in self._order:
+            while lane.queue and self._can_start(lane):
+                waiter = lane.queue.popleft()
+                if waiter.deadline is not None and waiter.deadline <= now:
+                    # Its own wait() times out and reports the shed
+                    waiter.event.set()
+                    continue
+                self._grant(lane, waiter)
+            if self._active >= self.concurrency:
+                return
+
+    def acquire(self, lane_name, deadline_ms=None):
+        """Wait for a slot in the lane and return a Ticket, or raise Rejected"""
+        arrived = time.monotonic()
+        lane = self.lanes[lane_name]
+        budget = deadline_ms / 1000 if deadline_ms else lane.default_deadline
+        deadline = arrived + budget if budget is not None else None
+        waiter = _Waiter(deadline)
+
+        with self._lock:
+            # A free slot is always taken. Shedding those on the service time
+            # alone could stop the estimate from ever being refreshed.
+            ahead = self._ahead(lane)
+            if ahead == 0 and self._can_start(lane):
+                self._grant(lane, waiter)
+                return Ticket(lane, arrived, arrived)
+
+            if len(lane.queue) >= lane.max_queue:
+                lane.shed['queue_full'] += 1
+                raise Rejected(429, 'queue_full', f"The {lane.name} queue is full",
+                               self._retry_after(lane))
+            if deadline is not None:
+                finish = arrived + self._estimated_wait(lane, ahead) + (lane.service_time or 0.0)
+                if finish > deadline:
+                    lane.shed['deadline'] += 1
+                    raise Rejected(503, 'deadline', "The deadline can't be met at the current load",
+                                   self._retry_after(lane))
+            lane.queue.append(waiter)
+
+        timeout = deadline - arrived if deadline is not None else None
+        admitted = False
+        try:
+            waiter.event.wait(timeout)
+            with self._lock:
+                if not waiter.granted:
+                    lane.shed['expired'] += 1
+                    raise Rejected(503, 'expired', "The deadline passed while the request was queued",
+                                   self._retry_after(lane))
+            admitted = True
+        finally:
+            if not admitted:
+                # Whatever interrupted the wait, leave no waiter or slot behind
+                with self._lock:
+                    if waiter in lane.queue:
+                        lane.queue.remove(waiter)
+                    if waiter.granted:
+                        self._active -= 1
+                        lane.active -= 1
+                        self._dispatch(time.monotonic())
+        return Ticket(lane, arrived, time.monotonic())
+
+    def release(self, ticket):
+        """Free the ticket's slot and record how long it was held"""
+        now = time.monotonic()
+        lane = ticket.lane
+        with self._lock:
+            held = now - ticket.started
+            if lane.service_time is None:
+                lane.service_time = held
+            else:
+                lane.service_time += SERVICE_TIME_ALPHA * (held - lane.service_time)
+            self._active -= 1
+            lane.active -= 1
+            self._dispatch(now)
+
+    def queue_depth(self, lane_name):
+        return len(self.lanes[lane_name].queue)
+
+    def stats(self):
+        """Per-lane slots, queue depth, service time and shed counts"""
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "active": self._active,
+                "lanes": {
+                    lane.name: {
+                        "active": lane.active,
+                        "max_active": lane.max_active,
+                        "queued": len(lane.queue),
+                        "max_queue": lane.max_queue,
+                        "service_ms": round(lane.service_time * 1000, 2) if lane.service_time is not None else None,
+                        "admitted": lane.admitted,
+                        "shed": dict(lane.shed)
+                    }
+                    for lane in self._order
+                }
+            }
+
+
+def install_admission(app, controller, bulk_routes, registry=None, admin_authorized=None):
+    """Register the admission hooks for /analyze* requests on a Flask app"""
+    if registry is not None:
+        wait_seconds = registry.histogram('ai_admission_wait_seconds', "Time /analyze* requests waited for a slot",
+                                          ('lane',))
+        lane_seconds = registry.histogram('ai_lane_request_duration_seconds',
+                                          "Latency of admitted /analyze* requests from arrival, per lane", ('lane',))
+        shed = registry.counter('ai_admission_shed_total', "Requests rejected by admission control",
+                                ('lane', 'reason'))
+        depth = registry.gauge('ai_admission_queue_depth', "Requests waiting for a slot", ('lane',))
+        for name in controller.lanes:
+            depth.set(0, name)
+
+    priority = {name: rank for rank, name in enumerate(controller.lanes)}
+
+    def request_lane():
+        path = request.path.rstrip('/')
+        route_lane = 'bulk' if any(path == route or path.startswith(route + '/') for route in bulk_routes) \
+            else 'interactive'
+        lane = request.headers.get(PRIORITY_HEADER, '').strip().lower()
+        if lane not in priority:
+            return route_lane
+        # Anyone may ask for a lower lane; a higher one would let bulk work
+        # back into the interactive lane, so it needs the admin token
+        if priority[lane] >= priority[route_lane] or (admin_authorized is not None and admin_authorized()):
+            return lane
+        return route_lane
+
+    @app.before_request
+    def admit_request():
+        if not request.path.startswith('/analyze'):
+            return None
+        lane = request_lane()
+        try:
+            deadline_ms = float(request.headers[DEADLINE_HEADER]) if DEADLINE_HEADER in request.headers else None
+        except ValueError:
+            deadline_ms = math.nan
+        if deadline_ms is not None and not (math.isfinite(deadline_ms) and 0 < deadline_ms <= MAX_DEADLINE_MS):
+            return jsonify({"error": f"'{DEADLINE_HEADER}' must be a number of milliseconds "
+                                     f"between 0 and {MAX_DEADLINE_MS}"}), 400
+
+        if registry is not None:
+            depth.inc(lane)
+        try:
+            ticket = controller.acquire(lane, deadline_ms)
+        except Rejected as e:
+            if registry is not None:
+                shed.inc(lane, e.reason)
+            response = jsonify({"error": str(e), "reason": e.reason, "lane": lane, "retry_after": e.retry_after})
+            response.status_code = e.status
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        finally:
+            if registry is not None:
+                depth.dec(lane)
+
+        g.admission_ticket = ticket
+        if registry is not None:
+            wait_seconds.observe(ticket.waited, lane)
+        return None
+
+    @app.after_request
+    def add_admission_headers(response):
+        ticket = g.get('admission_ticket')
+        if ticket is not None:
+            response.headers['X-Admission-Lane'] = ticket.lane.name
+            response.headers['X-Queue-Wait-Ms'] = f"{ticket.waited * 1000:.1f}"
+        return response
+
+    @app.teardown_request
+    def release_slot(exc):
+        # Always runs, so a failing request can't leak its slot
+        ticket = g.pop('admission_ticket', None)
+        if ticket is not None:
+            controller.release(ticket)
+            if registry is not None:
+                lane_seconds.observe(time.monotonic() - ticket.arrived, ticket.lane.name)
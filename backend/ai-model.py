@@ -13,6 +13,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import re
+import os
+import json
+import time
+import shutil
+import pickle
+import hashlib
+from functools import lru_cache
+from multiprocessing import Pool, cpu_count
 import nltk
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
@@ -33,36 +41,57 @@ nltk.download('omw-1.4')
 from google.colab import drive
 drive.mount('/content/drive')
 
-# Load datasets
-fake_df = pd.read_csv('/content/drive/MyDrive/FakeNewsProject/Fake.csv')
-true_df = pd.read_csv('/content/drive/MyDrive/FakeNewsProject/True.csv')
+# Dataset files and preprocessing settings
+data_dir = '/content/drive/MyDrive/FakeNewsProject'
+fake_path = f'{data_dir}/Fake.csv'
+true_path = f'{data_dir}/True.csv'
 
-# Add labels
-fake_df['label'] = 1  # 1 for fake news
-true_df['label'] = 0  # 0 for real news
+max_words = 10000
+max_len = 300
+test_size = 0.2
+split_seed = 42
+# Bump when clean_text() changes so cached preprocessing is rebuilt
+preprocess_version = 1
 
-# Combine datasets
-df = pd.concat([fake_df, true_df], axis=0)
+# Preprocessed data (cleaned corpus, padded arrays, tokenizer) is cached here
+# under a key derived from the CSV contents and the settings above
+preprocess_cache_root = f'{data_dir}/preprocess_cache'
 
-# Shuffle the dataset
-df = df.sample(frac=1).reset_index(drop=True)
+def load_dataset():
+    # Load datasets
+    fake_df = pd.read_csv(fake_path)
+    true_df = pd.read_csv(true_path)
 
-# Display first few rows
-df.head()
+    # Add labels
+    fake_df['label'] = 1  # 1 for fake news
+    true_df['label'] = 0  # 0 for real news
+
+    # Combine datasets
+    df = pd.concat([fake_df, true_df], axis=0)
 
-# Check for missing values
-print("Missing values:\n", df.isnull().sum())
+    # Shuffle the dataset
+    df = df.sample(frac=1).reset_index(drop=True)
 
-# Drop rows with missing values if any
-df = df.dropna()
+    # Check for missing values
+    print("Missing values:\n", df.isnull().sum())
 
-# Combine title and text for better analysis
-df['content'] = df['title'] + ' ' + df['text']
+    # Drop rows with missing values if any
+    df = df.dropna().reset_index(drop=True)
+
+    # Combine title and text for better analysis
+    df['content'] = df['title'] + ' ' + df['text']
+    return df
 
 # Text cleaning function
 lemmatizer = WordNetLemmatizer()
 stop_words = set(stopwords.words('english'))
 
+# The corpus repeats the same words millions of times, so lemmatize each
+# unique word only once
+@lru_cache(maxsize=None)
+def lemmatize(word):
+    return lemmatizer.lemmatize(word)
+
 def clean_text(text):
     # Convert to lowercase
     text = text.lower()
@@ -71,12 +100,108 @@ def clean_text(text):
     # Tokenize
     tokens = text.split()
     # Remove stopwords and lemmatize
-    tokens = [lemmatizer.lemmatize(word) for word in tokens if word not in stop_words]
+    tokens = [lemmatize(word) for word in tokens if word not in stop_words]
     # Join back to string
     return ' '.join(tokens)
 
-# Apply cleaning
-df['clean_content'] = df['content'].apply(clean_text)
+def clean_chunk(texts):
+    return [clean_text(text) for text in texts]
+
+def parallel_clean(texts, processes=None):
+    # Clean the corpus in chunks across processes (one core does ~all the
+    # work otherwise). Load WordNet first so forked workers share it.
+    lemmatizer.lemmatize('warmup')
+    processes = processes or cpu_count()
+    chunks = np.array_split(np.asarray(texts, dtype=object), processes * 4)
+    with Pool(processes) as pool:
+        cleaned = pool.map(clean_chunk, chunks)
+    return [text for chunk in cleaned for text in chunk]
+
+def preprocess_cache_key():
+    digest = hashlib.sha256()
+    for path in (fake_path, true_path):
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), b''):
+                digest.update(block)
+    settings = {
+        "max_words": max_words,
+        "max_len": max_len,
+        "test_size": test_size,
+        "split_seed": split_seed,
+        "preprocess_version": preprocess_version
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+def build_preprocessed(cache_path):
+    df = load_dataset()
+
+    # Apply cleaning
+    df['clean_content'] = parallel_clean(df['content'])
+
+    # Split data into train and test
+    train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=test_size, random_state=split_seed)
+    X_train = df['clean_content'].iloc[train_idx]
+    X_test = df['clean_content'].iloc[test_idx]
+
+    # Tokenization
+    tokenizer = Tokenizer(num_words=max_words)
+    tokenizer.fit_on_texts(X_train)
+
+    # Convert text to sequences
+    X_train_seq = tokenizer.texts_to_sequences(X_train)
+    X_test_seq = tokenizer.texts_to_sequences(X_test)
+
+    # Pad sequences
+    arrays = {
+        "X_train_pad": pad_sequences(X_train_seq, maxlen=max_len),
+        "X_test_pad": pad_sequences(X_test_seq, maxlen=max_len),
+        "y_train": df['label'].values[train_idx],
+        "y_test": df['label'].values[test_idx],
+        "train_idx": train_idx,
+        "test_idx": test_idx
+    }
+
+    # Write to a temporary directory and rename it, so an interrupted run
+    # never leaves a half-written cache entry behind
+    tmp_path = cache_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    df[['content', 'clean_content', 'label']].to_parquet(f'{tmp_path}/corpus.parquet')
+    for name, array in arrays.items():
+        np.save(f'{tmp_path}/{name}.npy', array)
+    with open(f'{tmp_path}/tokenizer.pickle', 'wb') as handle:
+        pickle.dump(tokenizer, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp_path, cache_path)
+
+def load_preprocessed(cache_path):
+    df = pd.read_parquet(f'{cache_path}/corpus.parquet')
+    # Padded arrays are memory-mapped rather than read into memory
+    arrays = {
+        name: np.load(f'{cache_path}/{name}.npy', mmap_mode='r')
+        for name in ('X_train_pad', 'X_test_pad', 'y_train', 'y_test', 'train_idx', 'test_idx')
+    }
+    with open(f'{cache_path}/tokenizer.pickle', 'rb') as handle:
+        tokenizer = pickle.load(handle)
+    return df, arrays, tokenizer
+
+cache_path = f'{preprocess_cache_root}/{preprocess_cache_key()}'
+if os.path.isdir(cache_path):
+    print(f"Loading preprocessed data from {cache_path}")
+else:
+    os.makedirs(preprocess_cache_root, exist_ok=True)
+    preprocess_start = time.perf_counter()
+    build_preprocessed(cache_path)
+    print(f"Preprocessing took {time.perf_counter() - preprocess_start:.1f}s, cached in {cache_path}")
+
+df, arrays, tokenizer = load_preprocessed(cache_path)
+X_train_pad, X_test_pad = arrays['X_train_pad'], arrays['X_test_pad']
+y_train, y_test = arrays['y_train'], arrays['y_test']
+X_train = df['clean_content'].iloc[arrays['train_idx']]
+X_test = df['clean_content'].iloc[arrays['test_idx']]
+
+# Display first few rows
+df.head()
 
 # Display cleaned text sample
 print("\nOriginal text:\n", df['content'][0])
@@ -110,65 +235,175 @@ plt.title('Common words in Real News')
 plt.axis('off')
 plt.show()
 
-# Split data into train and test
-X = df['clean_content']
-y = df['label']
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Tokenization
-max_words = 10000
-max_len = 300
-
-tokenizer = Tokenizer(num_words=max_words)
-tokenizer.fit_on_texts(X_train)
-
-# Convert text to sequences
-X_train_seq = tokenizer.texts_to_sequences(X_train)
-X_test_seq = tokenizer.texts_to_sequences(X_test)
-
-# Pad sequences
-X_train_pad = pad_sequences(X_train_seq, maxlen=max_len)
-X_test_pad = pad_sequences(X_test_seq, maxlen=max_len)
-
 print("Training shape:", X_train_pad.shape)
 print("Testing shape:", X_test_pad.shape)
 
 # Updated model building cell
 from tensorflow.keras import layers
 
-# Build LSTM model - updated version without input_length
-model = Sequential([
-    layers.Embedding(input_dim=max_words, output_dim=128),  # Removed input_length
-    layers.Bidirectional(layers.LSTM(64, return_sequences=True)),
-    layers.Dropout(0.2),
-    layers.Bidirectional(layers.LSTM(32)),
-    layers.Dropout(0.2),
-    layers.Dense(24, activation='relu'),
-    layers.Dropout(0.2),
-    layers.Dense(1, activation='sigmoid')
-])
-
-model.compile(loss='binary_crossentropy',
-              optimizer='adam',
-              metrics=['accuracy'])
-
-# The model will build itself when it first sees data
-model.build(input_shape=(None, max_len))  # Explicitly build the model
+# Set to True to train a model that ignores padding (Embedding mask_zero).
+# The AI service can then pad short inputs to length buckets
+# (AI_LENGTH_BUCKETS) with exactly the same predictions.
+mask_padding = False
+
+# Training input: 'numpy' feeds the full max_len arrays; 'tf.data' streams
+# the memory-mapped padded arrays and batches similar lengths together.
+# Bucketed batches carry less padding than the service's max_len rows, so
+# 'tf.data' needs mask_padding = True to keep training and serving inputs
+# equivalent.
+input_pipeline = 'numpy'
+batch_size = 128
+validation_fraction = 0.1
+shuffle_buffer = 10000
+# Batches are padded to the smallest of these widths that fits every row in
+# them instead of always to max_len (pad_to_bucket_boundary pads to b - 1)
+bucket_boundaries = [33, 65, 129, 201, max_len + 1]
+# Validation still uses max_len rows; with padding masked, both widths give
+# the same predictions, so EarlyStopping sees what the service will serve
+if input_pipeline == 'tf.data' and not mask_padding:
+    raise ValueError("input_pipeline = 'tf.data' requires mask_padding = True")
+
+# Mixed precision (bfloat16): True, False or 'auto' (only where the CPU has
+# native bf16). Off by default: on an AMX-capable test CPU the small LSTMs
+# trained ~15% slower in bf16 than in float32, so measure before enabling it.
+mixed_precision = False
+
+def cpu_supports_bf16():
+    try:
+        with open('/proc/cpuinfo') as handle:
+            flags = handle.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+use_mixed_precision = cpu_supports_bf16() if mixed_precision == 'auto' else mixed_precision
+if use_mixed_precision:
+    tf.keras.mixed_precision.set_global_policy('mixed_bfloat16')
+print(f"Input pipeline: {input_pipeline}, mixed precision: {use_mixed_precision}")
 
+# Build LSTM model - updated version without input_length
+def build_model():
+    model = Sequential([
+        layers.Embedding(input_dim=max_words, output_dim=128, mask_zero=mask_padding),  # Removed input_length
+        layers.Bidirectional(layers.LSTM(64, return_sequences=True)),
+        layers.Dropout(0.2),
+        layers.Bidirectional(layers.LSTM(32)),
+        layers.Dropout(0.2),
+        layers.Dense(24, activation='relu'),
+        layers.Dropout(0.2),
+        # Keep the output in float32 under mixed precision
+        layers.Dense(1, activation='sigmoid', dtype='float32')
+    ])
+
+    model.compile(loss='binary_crossentropy',
+                  optimizer='adam',
+                  metrics=['accuracy'])
+
+    # The model will build itself when it first sees data
+    model.build(input_shape=(None, max_len))  # Explicitly build the model
+    return model
+
+model = build_model()
 model.summary()
 
+# Hold out the last 10% of the training rows for validation, like
+# validation_split does
+val_start = int(len(X_train_pad) * (1 - validation_fraction))
+X_val_pad, y_val = X_train_pad[val_start:], y_train[val_start:]
+
+def make_train_dataset(X_pad, y, cache_file):
+    # Rows are pre-padded, so the tokens are the non-zero tail of each row.
+    # Yielding only the tail lets bucket_by_sequence_length group similar
+    # lengths and skip most of the LSTM steps over padding.
+    def rows():
+        for start in range(0, len(X_pad), 4096):
+            block = np.asarray(X_pad[start:start + 4096])
+            lengths = np.count_nonzero(block, axis=1)
+            for row, length, label in zip(block, lengths, y[start:start + 4096]):
+                yield row[max_len - length:], label
+
+    dataset = tf.data.Dataset.from_generator(rows, output_signature=(
+        tf.TensorSpec(shape=(None,), dtype=tf.int32),
+        tf.TensorSpec(shape=(), dtype=tf.float32)
+    ))
+    # Cache the trimmed rows on disk: later epochs skip the generator
+    dataset = dataset.cache(cache_file)
+    dataset = dataset.shuffle(shuffle_buffer, reshuffle_each_iteration=True)
+    # padded_batch pads at the end but the model was trained on pre-padded
+    # rows: reverse each row, pad, then reverse the batch back
+    dataset = dataset.map(lambda x, label: (tf.reverse(x, [0]), label), num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = dataset.bucket_by_sequence_length(
+        element_length_func=lambda x, label: tf.shape(x)[0],
+        bucket_boundaries=bucket_boundaries,
+        bucket_batch_sizes=[batch_size] * (len(bucket_boundaries) + 1),
+        pad_to_bucket_boundary=True
+    )
+    dataset = dataset.map(lambda x, label: (tf.reverse(x, [1]), label), num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+# Record epoch time and throughput for every run
+class EpochThroughput(tf.keras.callbacks.Callback):
+    def __init__(self, samples):
+        super().__init__()
+        self.samples = samples
+        self.epochs = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self.epoch_start
+        self.epochs.append({"epoch": epoch + 1, "seconds": round(seconds, 2),
+                            "samples_per_second": round(self.samples / seconds, 1)})
+        print(f"\nEpoch {epoch + 1}: {seconds:.1f}s, {self.samples / seconds:.0f} samples/s")
+
+throughput = EpochThroughput(val_start)
+
 # Define early stopping
 early_stop = EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True)
 
 # Train model
-history = model.fit(
-    X_train_pad,
-    y_train,
-    epochs=10,
-    batch_size=128,
-    validation_split=0.1,
-    callbacks=[early_stop]
-)
+if input_pipeline == 'tf.data':
+    tfdata_cache = f'{cache_path}/tfdata_train'
+    # A run interrupted during the first epoch leaves a partial cache behind
+    if not os.path.exists(f'{tfdata_cache}.index'):
+        for name in os.listdir(cache_path):
+            if name.startswith('tfdata_train'):
+                os.remove(f'{cache_path}/{name}')
+    train_data = make_train_dataset(X_train_pad[:val_start], y_train[:val_start].astype(np.float32), tfdata_cache)
+    history = model.fit(
+        train_data,
+        epochs=10,
+        validation_data=(X_val_pad, y_val),
+        callbacks=[early_stop, throughput]
+    )
+else:
+    history = model.fit(
+        X_train_pad,
+        y_train,
+        epochs=10,
+        batch_size=batch_size,
+        validation_split=validation_fraction,
+        callbacks=[early_stop, throughput]
+    )
+
+# Append this run's timings to the training log
+with open(f'{data_dir}/training_runs.jsonl', 'a') as handle:
+    handle.write(json.dumps({
+        "finished": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "input_pipeline": input_pipeline,
+        "mixed_precision": bool(use_mixed_precision),
+        "train_samples": val_start,
+        "epochs": throughput.epochs
+    }) + '\n')
+
+# Export a float32 copy of a mixed-precision model: the service and the
+# TFLite converter expect float32 layers. The weights are float32 already.
+if use_mixed_precision:
+    tf.keras.mixed_precision.set_global_policy('float32')
+    float_model = build_model()
+    float_model.set_weights(model.get_weights())
+    model = float_model
 
 # Plot training history
 plt.figure(figsize=(12, 6))
@@ -221,6 +456,231 @@ with open('/content/drive/MyDrive/tokenizer.pickle', 'wb') as handle:
 
 print("Model and tokenizer saved successfully!")
 
+# Export a trimmed vocabulary for the AI service.
+# Row i holds the word with token id i + 1; only the max_words entries the
+# model can see are kept, so the service doesn't have to unpickle the full
+# Tokenizer (word_counts, word_docs, index_docs, ...). Uses the service's own
+# writer, so copy backend/text_encoder.py next to this notebook.
+from text_encoder import save_vocabulary
+save_vocabulary(tokenizer, '/content/drive/MyDrive/tokenizer_vocab.npy')
+print("Vocabulary exported to tokenizer_vocab.npy / tokenizer_vocab.json")
+
+# Quantized TFLite models for CPU serving.
+# The converter only fuses the LSTMs into native TFLite kernels when the input
+# shape is fixed, so the models take one [1, max_len] row per invoke().
+tflite_fn = tf.function(lambda x: model(x, training=False))
+tflite_concrete = tflite_fn.get_concrete_function(tf.TensorSpec([1, max_len], tf.int32))
+
+def representative_dataset():
+    rows = np.random.RandomState(42).choice(len(X_train_pad), 500, replace=False)
+    for row in X_train_pad[rows]:
+        yield [row[np.newaxis, :].astype(np.int32)]
+
+def convert_to_tflite(int8=False):
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([tflite_concrete], model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if int8:
+        # Full-int8 weights and activations with no float fallback, so the
+        # conversion fails if any op lacks an int8 kernel. The token-id input
+        # stays int32 (ids exceed the int8 range) and the output is
+        # dequantized to float32, which is what tflite_backend reads.
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+tflite_models = {
+    "dynamic": convert_to_tflite(),
+    "int8": convert_to_tflite(int8=True)
+}
+for name, content in tflite_models.items():
+    with open(f'/content/drive/MyDrive/fake_news_detector_{name}.tflite', 'wb') as handle:
+        handle.write(content)
+
+print("TFLite models saved successfully!")
+
+# Parity report: Keras vs TFLite on the held-out test split
+def tflite_predict(content, X):
+    interpreter = tf.lite.Interpreter(model_content=content)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    probabilities = np.empty(len(X), dtype=np.float32)
+    for i, row in enumerate(X):
+        interpreter.set_tensor(input_index, row[np.newaxis, :].astype(np.int32))
+        interpreter.invoke()
+        probabilities[i] = interpreter.get_tensor(output_index)[0, 0]
+    return probabilities
+
+def to_verdicts(probabilities):
+    # Same thresholds as ai_service.py
+    return np.where(probabilities > 0.7, 'fake', np.where(probabilities < 0.3, 'real', 'uncertain'))
+
+keras_probs = model.predict(X_test_pad, verbose=0)[:, 0]
+keras_verdicts = to_verdicts(keras_probs)
+
+print(f"\n{'Backend':<16}{'Size (KB)':>10}{'Accuracy':>10}{'Verdict agree':>15}{'Max |dp|':>10}")
+print(f"{'keras (float32)':<16}{'-':>10}{accuracy_score(y_test, keras_probs > 0.5):>10.4f}{1.0:>15.4f}{0.0:>10.4f}")
+for name, content in tflite_models.items():
+    probs = tflite_predict(content, X_test_pad)
+    print(f"{'tflite ' + name:<16}{len(content) / 1024:>10.0f}"
+          f"{accuracy_score(y_test, probs > 0.5):>10.4f}"
+          f"{np.mean(to_verdicts(probs) == keras_verdicts):>15.4f}"
+          f"{np.max(np.abs(probs - keras_probs)):>10.4f}")
+
+# Optional stages below run after the BiLSTM, tokenizer, vocabulary and
+# TFLite models are saved, so a crash or timeout here doesn't lose the
+# main model.
+
+# First-stage linear model for the AI service cascade (AI_CASCADE).
+# TF-IDF + logistic regression on the same cleaned corpus decides the
+# clear-cut inputs; only inputs whose probability falls inside the
+# uncertainty band are escalated to the BiLSTM.
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+linear_model = make_pipeline(
+    TfidfVectorizer(ngram_range=(1, 2), min_df=2, max_features=200000, sublinear_tf=True),
+    LogisticRegression(C=4.0, max_iter=1000)
+)
+linear_model.fit(X_train, y_train)
+
+linear_probs = linear_model.predict_proba(X_test)[:, 1]
+bilstm_probs = model.predict(X_test_pad, verbose=0)[:, 0]
+
+def cascade_latency(n=200):
+    # Per-item latency of each tier, scoring one text at a time like the service
+    rows = np.random.RandomState(0).choice(len(X_test), n, replace=False)
+    texts = X_test.iloc[rows].tolist()
+    started = time.perf_counter()
+    for text in texts:
+        linear_model.predict_proba([text])
+    linear_ms = (time.perf_counter() - started) / n * 1000
+    # Compiled like the service's inference function, warmed up first
+    infer = tf.function(lambda x: model(x, training=False))
+    infer(X_test_pad[rows[:1]])
+    started = time.perf_counter()
+    for row in rows:
+        infer(X_test_pad[row:row + 1])
+    bilstm_ms = (time.perf_counter() - started) / n * 1000
+    return linear_ms, bilstm_ms
+
+linear_ms, bilstm_ms = cascade_latency()
+print(f"\nPer-item latency: linear {linear_ms:.2f} ms, BiLSTM {bilstm_ms:.2f} ms")
+
+# Evaluation report: inputs with a linear probability inside [low, high]
+# go to the BiLSTM, the rest keep the linear verdict
+print(f"\n{'Band':<14}{'Escalated':>10}{'Accuracy':>10}{'Agree w/ BiLSTM':>17}{'Est. ms/item':>14}")
+print(f"{'linear only':<14}{0.0:>10.1%}{accuracy_score(y_test, linear_probs > 0.5):>10.4f}"
+      f"{np.mean((linear_probs > 0.5) == (bilstm_probs > 0.5)):>17.4f}{linear_ms:>14.2f}")
+cascade_report = []
+for low, high in [(0.45, 0.55), (0.4, 0.6), (0.3, 0.7), (0.2, 0.8), (0.1, 0.9), (0.05, 0.95), (0.02, 0.98)]:
+    escalate = (linear_probs >= low) & (linear_probs <= high)
+    cascade_probs = np.where(escalate, bilstm_probs, linear_probs)
+    row = {
+        "band": [low, high],
+        "escalated": float(escalate.mean()),
+        "accuracy": float(accuracy_score(y_test, cascade_probs > 0.5)),
+        "agreement": float(np.mean((cascade_probs > 0.5) == (bilstm_probs > 0.5))),
+        "ms_per_item": linear_ms + escalate.mean() * bilstm_ms
+    }
+    cascade_report.append(row)
+    print(f"{f'{low:.2f}-{high:.2f}':<14}{row['escalated']:>10.1%}{row['accuracy']:>10.4f}"
+          f"{row['agreement']:>17.4f}{row['ms_per_item']:>14.2f}")
+print(f"{'BiLSTM only':<14}{1.0:>10.1%}{accuracy_score(y_test, bilstm_probs > 0.5):>10.4f}"
+      f"{1.0:>17.4f}{bilstm_ms:>14.2f}")
+
+# Save the linear model and the report; pick AI_CASCADE_BAND from the table
+with open('/content/drive/MyDrive/fake_news_linear.pickle', 'wb') as handle:
+    pickle.dump(linear_model, handle, protocol=pickle.HIGHEST_PROTOCOL)
+with open('/content/drive/MyDrive/cascade_report.json', 'w') as handle:
+    json.dump({"linear_ms": linear_ms, "bilstm_ms": bilstm_ms, "bands": cascade_report}, handle, indent=2)
+
+# Distilled student for CPU serving.
+# A 1D-CNN over the same Embedding(max_words, 128) input, trained to match
+# the BiLSTM's probabilities instead of only the hard labels. Convolutions
+# look at all 300 positions in parallel where the LSTMs step through them
+# one at a time, so the student is far cheaper to run on a CPU. It loads
+# like the BiLSTM: serve it with AI_MODEL_PATH=fake_news_student.h5 and
+# the same tokenizer files.
+# Weight of the teacher's probability in the student's target; the rest
+# is the true label
+distill_alpha = 0.7
+
+def build_student():
+    student = Sequential([
+        layers.Embedding(input_dim=max_words, output_dim=128),
+        layers.Conv1D(128, 5, activation='relu'),
+        layers.GlobalMaxPooling1D(),
+        layers.Dropout(0.2),
+        layers.Dense(24, activation='relu'),
+        layers.Dense(1, activation='sigmoid', dtype='float32')
+    ])
+    # binary_crossentropy accepts soft targets in [0, 1]; Keras accuracy
+    # would compare against them exactly, so it is left out
+    student.compile(loss='binary_crossentropy', optimizer='adam')
+    student.build(input_shape=(None, max_len))
+    return student
+
+teacher_train_probs = model.predict(X_train_pad, batch_size=512, verbose=0)[:, 0]
+distill_targets = (distill_alpha * teacher_train_probs
+                   + (1 - distill_alpha) * np.asarray(y_train, dtype=np.float32))
+
+student = build_student()
+student.summary()
+student.fit(
+    X_train_pad[:val_start],
+    distill_targets[:val_start],
+    epochs=10,
+    batch_size=batch_size,
+    validation_data=(X_val_pad, distill_targets[val_start:]),
+    callbacks=[EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True)]
+)
+student_probs = student.predict(X_test_pad, verbose=0)[:, 0]
+
+def inference_latency(keras_model, n=200, batch=64):
+    # Per-item latency one row at a time like the service, and per-batch
+    # latency for micro-batched traffic; compiled and warmed up first
+    rows = np.random.RandomState(0).choice(len(X_test_pad), n, replace=False)
+    infer = tf.function(lambda x: keras_model(x, training=False))
+    infer(X_test_pad[rows[:1]])
+    started = time.perf_counter()
+    for row in rows:
+        infer(X_test_pad[row:row + 1])
+    single_ms = (time.perf_counter() - started) / n * 1000
+
+    batch_rows = np.asarray(X_test_pad[np.sort(rows[:batch])])
+    infer(batch_rows)
+    started = time.perf_counter()
+    for _ in range(10):
+        infer(batch_rows)
+    batch_ms = (time.perf_counter() - started) / 10 * 1000
+    return {"single_ms": single_ms, "batch_ms": batch_ms, "batch_size": len(batch_rows),
+            "batch_ms_per_item": batch_ms / len(batch_rows)}
+
+distill_report = {"alpha": distill_alpha}
+for name, keras_model, probs in [('teacher', model, bilstm_probs), ('student', student, student_probs)]:
+    distill_report[name] = {
+        "parameters": keras_model.count_params(),
+        "accuracy": float(accuracy_score(y_test, probs > 0.5)),
+        **inference_latency(keras_model)
+    }
+distill_report["accuracy_delta"] = distill_report["student"]["accuracy"] - distill_report["teacher"]["accuracy"]
+distill_report["agreement"] = float(np.mean((student_probs > 0.5) == (bilstm_probs > 0.5)))
+
+print(f"\n{'Model':<10}{'Params':>10}{'Accuracy':>10}{'1 item ms':>11}{'Batch ms':>10}{'ms/item':>9}")
+for name in ('teacher', 'student'):
+    row = distill_report[name]
+    print(f"{name:<10}{row['parameters']:>10}{row['accuracy']:>10.4f}{row['single_ms']:>11.2f}"
+          f"{row['batch_ms']:>10.2f}{row['batch_ms_per_item']:>9.3f}")
+print(f"Accuracy delta {distill_report['accuracy_delta']:+.4f}, "
+      f"agreement with the BiLSTM {distill_report['agreement']:.4f} "
+      f"(batches of {distill_report['student']['batch_size']})")
+
+student.save('/content/drive/MyDrive/fake_news_student.h5')
+with open('/content/drive/MyDrive/distillation_report.json', 'w') as handle:
+    json.dump(distill_report, handle, indent=2)
+
 # Function to predict custom input
 def predict_news(text):
     # Clean the text
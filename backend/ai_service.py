@@ -1,48 +1,247 @@
 import os
+import hashlib
+import hmac
 import pickle
+import random
 import re
-import nltk
+import threading
+import time
+from contextlib import contextmanager
 import numpy as np
-import tensorflow as tf
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-import requests
 from urllib.parse import urlparse
 import json
+from micro_batcher import MicroBatcher
+from verdict_cache import VerdictCache, make_cache_key
+from text_encoder import TextEncoder
+from near_duplicate import NearDuplicateIndex, fingerprint
+from attribution import occlusion_attribution
+from tflite_backend import InterpreterPool
+from metrics import MetricsRegistry, SIZE_BUCKETS
 
-# Download required NLTK data
+# MessagePack responses are optional (pip install msgpack)
 try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+    import msgpack
+except ImportError:
+    msgpack = None
 
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
-
-try:
-    nltk.data.find('corpora/omw-1.4')
-except LookupError:
-    nltk.download('omw-1.4')
+# TensorFlow and NLTK are imported by load_model() rather than at import time
+tf = None
 
 app = Flask(__name__)
 CORS(app)
 
-# Global variables for model and tokenizer
-model = None
-tokenizer = None
+# The serving model version (see ModelBundle). encoder is the active
+# bundle's text encoder, or one built ahead of time by load_encoder().
+active_bundle = None
+bundle_lock = threading.Lock()
+encoder = None
+encoder_files = ()
+url_ingestor = None
+verdict_cache = None
+admission = None
+job_manager = None
+service_ready = False
 max_len = 300
 
-# Text cleaning function
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
+# Timestamp of the current second, shared by the responses in it
+last_timestamp = (0, "")
+
+# Hot-swap state, reported on /health
+reload_lock = threading.Lock()
+reload_status = {"state": "idle"}
+model_watcher = None
+
+# Model artifacts. The trimmed vocabulary file (see text_encoder.py)
+# is used when present; the pickled Keras Tokenizer is the fallback.
+MODEL_PATH = os.environ.get('AI_MODEL_PATH', 'fake_news_detector.h5')
+VOCAB_PATH = os.environ.get('AI_VOCAB_PATH', 'tokenizer_vocab.npy')
+TOKENIZER_PATH = os.environ.get('AI_TOKENIZER_PATH', 'tokenizer.pickle')
+
+# Versioned model directory: AI_MODEL_DIR/<version>/ holds one version's
+# artifacts (named like the AI_*_PATH files) and AI_MODEL_DIR/CURRENT holds
+# the name of the version to serve. Empty = the flat AI_*_PATH files.
+MODEL_DIR = os.environ.get('AI_MODEL_DIR', '')
+# Poll CURRENT (or the flat model files) every N seconds and hot-swap on a
+# change; 0 = reload only through POST /admin/reload or SIGHUP (serve.py)
+MODEL_WATCH_INTERVAL = float(os.environ.get('AI_MODEL_WATCH_INTERVAL', '0'))
+# How long a replaced version may keep serving the requests that started on it
+MODEL_DRAIN_SECONDS = float(os.environ.get('AI_MODEL_DRAIN_SECONDS', '30'))
+
+# Inference mode: 'compiled' calls the model through a traced tf.function with a
+# fixed (batch, max_len) int32 signature, 'predict' uses model.predict
+INFERENCE_MODE = os.environ.get('AI_INFERENCE_MODE', 'compiled')
+INFERENCE_XLA = os.environ.get('AI_INFERENCE_XLA', '0') == '1'
+
+# Inference backend: 'keras' runs fake_news_detector.h5, 'tflite' runs a
+# quantized model exported by ai-model.py through a pool of interpreters
+INFERENCE_BACKEND = os.environ.get('AI_INFERENCE_BACKEND', 'keras')
+TFLITE_MODEL_PATH = os.environ.get('AI_TFLITE_MODEL_PATH', 'fake_news_detector_dynamic.tflite')
+TFLITE_POOL_SIZE = int(os.environ.get('AI_TFLITE_POOL_SIZE', '4'))
+TFLITE_THREADS = int(os.environ.get('AI_TFLITE_THREADS', '1'))
+
+# Length-adaptive padding: short inputs are padded to the smallest of these
+# lengths instead of max_len. Only enabled when the model ignores padding
+# (Embedding(mask_zero=True)) or when bucketed predictions match the
+# max_len ones within AI_BUCKET_TOLERANCE on the texts in
+# AI_BUCKET_CALIBRATION_PATH (one per line); an unmasked model without a
+# calibration file always pads to max_len.
+LENGTH_BUCKETS = [int(n) for n in os.environ.get('AI_LENGTH_BUCKETS', '').split(',') if n.strip()]
+BUCKET_TOLERANCE = float(os.environ.get('AI_BUCKET_TOLERANCE', '0.01'))
+BUCKET_CALIBRATION_PATH = os.environ.get('AI_BUCKET_CALIBRATION_PATH', '')
+
+# Long-document mode: texts longer than max_len tokens are scored as
+# overlapping max_len-token windows (AI_WINDOW_CHUNK windows per forward pass)
+# and combined with max, mean or length-weighted averaging
+WINDOW_STRIDE = int(os.environ.get('AI_WINDOW_STRIDE', '150'))
+WINDOW_CHUNK = int(os.environ.get('AI_WINDOW_CHUNK', '32'))
+WINDOW_AGGREGATION = os.environ.get('AI_WINDOW_AGGREGATION', 'mean')
+WINDOW_AGGREGATIONS = ('max', 'mean', 'weighted')
+
+# Two-tier cascade: the TF-IDF + logistic regression model trained by
+# ai-model.py decides clear-cut inputs, and only texts whose linear
+# probability falls inside AI_CASCADE_BAND (inclusive) go on to the BiLSTM.
+# Pick the band from the cascade report that ai-model.py prints.
+CASCADE_ENABLED = os.environ.get('AI_CASCADE', '0') == '1'
+CASCADE_MODEL_PATH = os.environ.get('AI_CASCADE_MODEL_PATH', 'fake_news_linear.pickle')
+CASCADE_BAND = tuple(float(n) for n in os.environ.get('AI_CASCADE_BAND', '0.2,0.8').split(','))
+
+# Near-duplicate reuse (see near_duplicate.py): a text whose estimated
+# Jaccard similarity to a recently scored one is at least the threshold gets
+# that text's verdict without running the model. The index belongs to the
+# model version, so a hot swap starts it empty. Long-document windows are
+# never matched.
+NEAR_DUP_ENABLED = os.environ.get('AI_NEAR_DUP', '0') == '1'
+NEAR_DUP_THRESHOLD = float(os.environ.get('AI_NEAR_DUP_THRESHOLD', '0.8'))
+NEAR_DUP_MAX_ENTRIES = int(os.environ.get('AI_NEAR_DUP_MAX_ENTRIES', '200000'))
+NEAR_DUP_MIN_TOKENS = int(os.environ.get('AI_NEAR_DUP_MIN_TOKENS', '8'))
+NEAR_DUP_TTL_SECONDS = float(os.environ.get('AI_NEAR_DUP_TTL_SECONDS', '3600'))
+
+# Occlusion attribution ("explain": true on /analyze/text, see attribution.py).
+# At most AI_EXPLAIN_MAX_ROWS occluded rows are scored, AI_EXPLAIN_CHUNK per
+# forward pass, stopping after the pass that crosses AI_EXPLAIN_BUDGET_MS.
+EXPLAIN_MAX_ROWS = int(os.environ.get('AI_EXPLAIN_MAX_ROWS', '128'))
+EXPLAIN_CHUNK = int(os.environ.get('AI_EXPLAIN_CHUNK', '64'))
+EXPLAIN_BUDGET_MS = float(os.environ.get('AI_EXPLAIN_BUDGET_MS', '1000'))
+EXPLAIN_TOP_K = int(os.environ.get('AI_EXPLAIN_TOP_K', '10'))
+
+# Tweet ingestion for /analyze/url (see url_ingest.py). Without a fetch URL
+# template the placeholder extract_tweet_content() is used.
+TWEET_FETCH_URL = os.environ.get('AI_TWEET_FETCH_URL', '')
+FETCH_TIMEOUT = float(os.environ.get('AI_FETCH_TIMEOUT', '5'))
+FETCH_PER_HOST_LIMIT = int(os.environ.get('AI_FETCH_PER_HOST_LIMIT', '8'))
+FETCH_CACHE_TTL = float(os.environ.get('AI_FETCH_CACHE_TTL', '600'))
+URL_BATCH_MAX_ITEMS = int(os.environ.get('AI_URL_BATCH_MAX_ITEMS', '100'))
+
+# Verdict cache (keyed on cleaned text + model version)
+CACHE_ENABLED = os.environ.get('AI_CACHE', '1') == '1'
+CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', '10000'))
+CACHE_TTL_SECONDS = float(os.environ.get('AI_CACHE_TTL_SECONDS', '3600'))
+CACHE_SHARED_PATH = os.environ.get('AI_CACHE_SHARED_PATH', '')
+
+# Representative input used to warm up the pipeline before reporting ready
+WARMUP_TEXT = "Scientists have discovered a new species of dinosaur in Argentina, officials said on Monday."
+
+# Micro-batching configuration (collect concurrent requests into one forward pass)
+BATCHING_ENABLED = os.environ.get('AI_BATCHING', '1') == '1'
+BATCH_MAX_SIZE = int(os.environ.get('AI_BATCH_MAX_SIZE', '32'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('AI_BATCH_MAX_WAIT_MS', '5'))
+
+# Response encodings besides JSON (see respond())
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Bulk endpoint limits (/analyze/batch)
+BULK_MAX_ITEMS = int(os.environ.get('AI_BULK_MAX_ITEMS', '1000'))
+BULK_CHUNK_SIZE = int(os.environ.get('AI_BULK_CHUNK_SIZE', '256'))
+
+# Admission control (see admission.py). At most AI_ADMISSION_CONCURRENCY
+# /analyze* requests run at once per process, and the bulk lane (BULK_ROUTES,
+# or any request sent with X-Priority: bulk) may hold at most
+# AI_ADMISSION_BULK_CONCURRENCY of those slots. Default deadlines are per
+# lane, 0 = none.
+ADMISSION_ENABLED = os.environ.get('AI_ADMISSION', '0') == '1'
+ADMISSION_CONCURRENCY = int(os.environ.get('AI_ADMISSION_CONCURRENCY', '32'))
+ADMISSION_BULK_CONCURRENCY = int(os.environ.get('AI_ADMISSION_BULK_CONCURRENCY', '2'))
+ADMISSION_INTERACTIVE_QUEUE = int(os.environ.get('AI_ADMISSION_INTERACTIVE_QUEUE', '64'))
+ADMISSION_BULK_QUEUE = int(os.environ.get('AI_ADMISSION_BULK_QUEUE', '16'))
+ADMISSION_INTERACTIVE_DEADLINE_MS = float(os.environ.get('AI_ADMISSION_INTERACTIVE_DEADLINE_MS', '0'))
+ADMISSION_BULK_DEADLINE_MS = float(os.environ.get('AI_ADMISSION_BULK_DEADLINE_MS', '0'))
+BULK_ROUTES = ('/analyze/batch', '/analyze/urls')
+
+# Asynchronous scoring jobs (see jobs.py). Submissions are spooled to
+# AI_JOBS_DIR and scored by AI_JOBS_WORKERS threads per process, a chunk of
+# AI_JOBS_CHUNK_SIZE texts at a time, through the /analyze/batch path. With
+# admission control on, each chunk holds a bulk slot.
+JOBS_ENABLED = os.environ.get('AI_JOBS', '0') == '1'
+JOBS_DIR = os.environ.get('AI_JOBS_DIR', 'jobs')
+JOBS_WORKERS = int(os.environ.get('AI_JOBS_WORKERS', '1'))
+JOBS_CHUNK_SIZE = int(os.environ.get('AI_JOBS_CHUNK_SIZE', '512'))
+JOBS_MAX_ROWS = int(os.environ.get('AI_JOBS_MAX_ROWS', '1000000'))
+JOBS_RETENTION_HOURS = float(os.environ.get('AI_JOBS_RETENTION_HOURS', '24'))
+# Failed attempts at one chunk (about one per second) before a job fails
+JOBS_CHUNK_RETRIES = int(os.environ.get('AI_JOBS_CHUNK_RETRIES', '60'))
+
+# On-demand request profiling (see profiling.py). With AI_PROFILING=0 no
+# profiling hooks or routes are installed, so it costs nothing.
+# AI_ADMIN_TOKEN is required for X-Profile and all /admin routes, which stay
+# closed until it is set (sampling via AI_PROFILE_SAMPLE_RATE doesn't need it).
+PROFILING_ENABLED = os.environ.get('AI_PROFILING', '0') == '1'
+PROFILE_DIR = os.environ.get('AI_PROFILE_DIR', 'profiles')
+PROFILE_MAX_ENTRIES = int(os.environ.get('AI_PROFILE_MAX_ENTRIES', '50'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('AI_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TF_TRACE = os.environ.get('AI_PROFILE_TF_TRACE', '0') == '1'
+ADMIN_TOKEN = os.environ.get('AI_ADMIN_TOKEN', '')
+
+# Request and pipeline metrics, served on /metrics
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram('ai_request_duration_seconds', "Time spent handling /analyze* requests", ('route',))
+REQUESTS = metrics.counter('ai_requests_total', "Handled /analyze* requests", ('route', 'status'))
+REQUEST_ERRORS = metrics.counter('ai_request_errors_total', "/analyze* requests answered with an error status", ('route',))
+IN_FLIGHT = metrics.gauge('ai_requests_in_flight', "/analyze* requests currently being handled")
+STAGE_SECONDS = metrics.histogram('ai_stage_duration_seconds', "Time spent in each pipeline stage", ('stage',))
+PREDICTION_ERRORS = metrics.counter('ai_prediction_errors_total', "Texts that could not be scored", ('reason',))
+INPUT_CHARS = metrics.histogram('ai_input_chars', "Characters per analyzed text", buckets=SIZE_BUCKETS)
+CASCADE_DECISIONS = metrics.counter('ai_cascade_decisions_total', "Texts decided by each cascade tier", ('tier',))
+INPUT_TOKENS = metrics.histogram('ai_input_tokens', "Tokens per analyzed text after cleaning", buckets=SIZE_BUCKETS)
+MODEL_RELOADS = metrics.counter('ai_model_reloads_total', "Model hot-swap attempts", ('outcome',))
+NEAR_DUP_LOOKUPS = metrics.counter('ai_near_duplicate_lookups_total', "Near-duplicate index lookups", ('result',))
+metrics.gauge('ai_batch_queue_depth', "Rows waiting for the micro-batcher",
+              callback=lambda: active_bundle.batcher.stats()["queue_depth"]
+              if active_bundle is not None and active_bundle.batcher is not None else None)
+metrics.gauge('ai_service_ready', "1 once the model is loaded and warmed up", callback=lambda: int(service_ready))
+
+# Text cleaning tools, set by load_text_tools()
+lemmatizer = None
+stop_words = None
+
+def import_tensorflow():
+    """Import TensorFlow on first use"""
+    global tf
+    if tf is None:
+        import tensorflow
+        tf = tensorflow
+    return tf
+
+def load_text_tools():
+    """Load NLTK stopwords and WordNet, downloading them only if missing"""
+    global lemmatizer, stop_words
+    import nltk
+    from nltk.corpus import stopwords, wordnet
+    from nltk.stem import WordNetLemmatizer
+    
+    try:
+        stop_words = set(stopwords.words('english'))
+        wordnet.ensure_loaded()
+    except LookupError:
+        for package in ('stopwords', 'wordnet', 'omw-1.4'):
+            nltk.download(package)
+        stop_words = set(stopwords.words('english'))
+    
+    lemmatizer = WordNetLemmatizer()
 
 def clean_text(text):
-    """Clean and preprocess text for analysis"""
+    """Clean and preprocess text for analysis (needs load_text_tools())"""
     if not isinstance(text, str):
         return ""
     
@@ -57,82 +256,844 @@ def clean_text(text):
     # Join back to string
     return ' '.join(tokens)
 
+def file_fingerprint(*paths):
+    """Short content hash of the given files, used as the model version"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+def resolve_model_version(version=None):
+    """(version name, artifact paths) of a model version, the CURRENT one by default"""
+    if not MODEL_DIR:
+        return None, {
+            "model": MODEL_PATH,
+            "vocab": VOCAB_PATH,
+            "tokenizer": TOKENIZER_PATH,
+            "tflite": TFLITE_MODEL_PATH,
+            "cascade": CASCADE_MODEL_PATH
+        }
+    
+    if version is None:
+        with open(os.path.join(MODEL_DIR, 'CURRENT')) as handle:
+            version = handle.read().strip()
+    if not version or os.path.basename(version) != version or version.startswith('.'):
+        raise ValueError(f"Invalid model version {version!r}")
+    directory = os.path.join(MODEL_DIR, version)
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"Model version directory {directory} does not exist")
+    return version, {
+        "model": os.path.join(directory, os.path.basename(MODEL_PATH)),
+        "vocab": os.path.join(directory, os.path.basename(VOCAB_PATH)),
+        "tokenizer": os.path.join(directory, os.path.basename(TOKENIZER_PATH)),
+        "tflite": os.path.join(directory, os.path.basename(TFLITE_MODEL_PATH)),
+        "cascade": os.path.join(directory, os.path.basename(CASCADE_MODEL_PATH))
+    }
+
+def encoder_source(paths):
+    """Files the text encoder is built from: the vocabulary, else the pickled tokenizer"""
+    return (paths["vocab"],) if os.path.exists(paths["vocab"]) else (paths["tokenizer"],)
+
+def build_encoder(paths):
+    """Build the fused raw text -> padded ids encoder (same ids as clean_text + tokenizer)"""
+    if lemmatizer is None:
+        load_text_tools()
+    
+    if os.path.exists(paths["vocab"]):
+        return TextEncoder.from_vocabulary(paths["vocab"], max_len, stop_words, lemmatizer.lemmatize)
+    with open(paths["tokenizer"], 'rb') as handle:
+        keras_tokenizer = pickle.load(handle)
+    return TextEncoder.from_tokenizer(keras_tokenizer, max_len, stop_words, lemmatizer.lemmatize)
+
+def load_encoder():
+    """Load the NLTK tools and build the encoder of the current model version"""
+    global encoder, encoder_files
+    
+    load_text_tools()
+    _, paths = resolve_model_version()
+    encoder = build_encoder(paths)
+    encoder_files = encoder_source(paths)
+
+def configure_tensorflow_threads(intra_op_threads, inter_op_threads):
+    """Set TF thread pool sizes; must run before the model is loaded"""
+    import_tensorflow()
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+class ModelBundle:
+    """One loaded model version: encoder, model, inference path and micro-batcher
+    
+    Requests take the active bundle once (serving_bundle()) and use it until
+    they finish, so a hot swap never pairs one version's vocabulary with
+    another version's model.
+    """
+    
+    def __init__(self, name, paths):
+        self.name = name
+        self.paths = paths
+        self.version = None
+        self.encoder = None
+        self.vocab_files = ()
+        self.model = None
+        self.infer_fn = None
+        self.tflite_pool = None
+        self.linear_model = None
+        self.near_duplicates = None
+        self.length_buckets = []
+        self.bucket_validation = None
+        self.batcher = None
+        self.loaded_at = None
+        
+        # Requests currently using this bundle
+        self._users = 0
+        self._idle = threading.Condition()
+    
+    def load(self):
+        """Load the artifacts; nothing serves from the bundle until it is activated"""
+        paths = self.paths
+        
+        # Reuse an encoder built from the same files (e.g. by serve.py before forking)
+        self.vocab_files = encoder_source(paths)
+        if encoder is not None and encoder_files == self.vocab_files:
+            self.encoder = encoder
+        else:
+            self.encoder = build_encoder(paths)
+        
+        # Load the model
+        if INFERENCE_BACKEND == 'tflite':
+            self.tflite_pool = InterpreterPool(paths["tflite"], TFLITE_POOL_SIZE, TFLITE_THREADS)
+            model_file = paths["tflite"]
+        else:
+            import_tensorflow()
+            self.model = tf.keras.models.load_model(paths["model"])
+            model_file = paths["model"]
+        
+        # First-stage linear model of the cascade
+        cascade_files = ()
+        if CASCADE_ENABLED:
+            with open(paths["cascade"], 'rb') as handle:
+                self.linear_model = pickle.load(handle)
+            cascade_files = (paths["cascade"],)
+        
+        # Version directories are named by their version; the flat layout
+        # uses a content hash, after AI_MODEL_VERSION if that is set, so
+        # reloading changed files always changes the version (and cache keys)
+        fingerprint = file_fingerprint(model_file, *self.vocab_files, *cascade_files)
+        pinned = os.environ.get('AI_MODEL_VERSION')
+        self.version = self.name or (f"{pinned}-{fingerprint}" if pinned else fingerprint)
+        
+        # Trace the forward pass once instead of going through model.predict per call
+        if self.model is not None and INFERENCE_MODE == 'compiled':
+            self.infer_fn = build_inference_fn(self.model, variable_length=bool(LENGTH_BUCKETS))
+        
+        # Pad short inputs to length buckets if that keeps the predictions
+        if LENGTH_BUCKETS:
+            self.configure_length_buckets()
+        
+        # Start the micro-batching scheduler in front of the model. TFLite
+        # models score one row per invoke(), so requests go straight to the
+        # interpreter pool instead.
+        if BATCHING_ENABLED and self.tflite_pool is None:
+            self.batcher = MicroBatcher(self.score_sequences, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS).start()
+        
+        if NEAR_DUP_ENABLED:
+            self.near_duplicates = NearDuplicateIndex(
+                NEAR_DUP_MAX_ENTRIES, NEAR_DUP_THRESHOLD, min_tokens=NEAR_DUP_MIN_TOKENS,
+                ttl_seconds=NEAR_DUP_TTL_SECONDS or None)
+        
+        self.loaded_at = time.time()
+        return self
+    
+    def acquire(self):
+        with self._idle:
+            self._users += 1
+    
+    def release(self):
+        with self._idle:
+            self._users -= 1
+            if not self._users:
+                self._idle.notify_all()
+    
+    def retire(self, timeout=MODEL_DRAIN_SECONDS):
+        """Wait for the requests still using this bundle, then release it"""
+        with self._idle:
+            drained = self._idle.wait_for(lambda: not self._users, timeout)
+        if not drained:
+            print(f"Model {self.version}: {self._users} requests still running after {timeout}s, releasing anyway")
+        self.close()
+        print(f"Model {self.version} retired")
+    
+    def close(self):
+        """Stop the batcher (after its queued rows) and drop the model"""
+        if self.batcher is not None:
+            self.batcher.stop(timeout=MODEL_DRAIN_SECONDS)
+        self.model = None
+        self.infer_fn = None
+        self.tflite_pool = None
+        self.linear_model = None
+    
+    def inference_mode(self):
+        """Name of the active inference path, for /health"""
+        if self.tflite_pool is not None:
+            return "tflite"
+        if self.infer_fn is None:
+            return "predict"
+        return "compiled_xla" if INFERENCE_XLA else "compiled"
+    
+    def score_sequences(self, padded_seqs):
+        """Run one forward pass over a batch of padded sequences"""
+        if self.tflite_pool is not None:
+            return self.tflite_pool.predict(np.asarray(padded_seqs, dtype=np.int32))
+        
+        if self.infer_fn is None:
+            prediction = self.model.predict(padded_seqs, verbose=0)
+            return prediction[:, 0]
+        
+        padded_seqs = np.asarray(padded_seqs, dtype=np.int32)
+        n = len(padded_seqs)
+        if INFERENCE_XLA and compiled_batch_size(n) != n:
+            filler = np.zeros((compiled_batch_size(n) - n, padded_seqs.shape[1]), dtype=np.int32)
+            padded_seqs = np.concatenate([padded_seqs, filler])
+        
+        prediction = self.infer_fn(padded_seqs).numpy()
+        return prediction[:n, 0]
+    
+    def bucket_width(self, n_tokens):
+        """Smallest length bucket that holds n_tokens, or max_len"""
+        for width in self.length_buckets:
+            if n_tokens <= width:
+                return width
+        return max_len
+    
+    def trim_to_bucket(self, padded_row):
+        """Drop leading padding down to the row's length bucket"""
+        if not self.length_buckets:
+            return padded_row
+        # Token ids start at 1, so the non-zero entries are exactly the tokens
+        return padded_row[max_len - self.bucket_width(np.count_nonzero(padded_row)):]
+    
+    def score_by_bucket(self, padded_seqs):
+        """Score full-length rows, grouping them by length bucket"""
+        if not self.length_buckets:
+            return self.score_sequences(padded_seqs)
+        
+        probabilities = np.empty(len(padded_seqs), dtype=np.float32)
+        widths = np.array([self.bucket_width(n) for n in np.count_nonzero(padded_seqs, axis=1)])
+        for width in np.unique(widths):
+            rows = np.flatnonzero(widths == width)
+            probabilities[rows] = self.score_sequences(padded_seqs[rows, max_len - width:])
+        return probabilities
+    
+    def predict_probability(self, padded_row):
+        """Score a single padded sequence, batching it with concurrent requests"""
+        padded_row = self.trim_to_bucket(padded_row)
+        if self.batcher is not None:
+            return self.batcher.predict(padded_row)
+        return float(self.score_sequences(padded_row[np.newaxis, :])[0])
+    
+    def model_masks_padding(self):
+        """Whether the model's Embedding layer masks the padding id"""
+        if self.model is None:
+            return False
+        return any(getattr(layer, 'mask_zero', False) for layer in self.model.layers)
+    
+    def bucket_calibration_rows(self):
+        """Texts from AI_BUCKET_CALIBRATION_PATH, encoded, used to validate length buckets"""
+        with open(BUCKET_CALIBRATION_PATH, encoding='utf-8') as handle:
+            texts = [line.strip() for line in handle if line.strip()]
+        _, rows = self.encoder.encode_batch(texts)
+        return rows[np.count_nonzero(rows, axis=1) > 0]
+    
+    def configure_length_buckets(self):
+        """Enable length buckets if the model masks padding or they match max_len on real texts"""
+        buckets = sorted(width for width in set(LENGTH_BUCKETS) if 0 < width < max_len)
+        if not buckets or self.tflite_pool is not None:
+            # The TFLite models have a fixed [1, max_len] input
+            self.length_buckets = []
+            return
+        
+        masked = self.model_masks_padding()
+        if not masked and not BUCKET_CALIBRATION_PATH:
+            # Random token rows say little about real inputs, so an unmasked
+            # model needs representative texts before padding can change
+            self.length_buckets = []
+            print("Length buckets disabled: the model doesn't mask padding and "
+                  "AI_BUCKET_CALIBRATION_PATH is not set")
+            return
+        self.length_buckets = buckets
+        
+        rows = self.bucket_calibration_rows() if BUCKET_CALIBRATION_PATH else np.zeros((0, max_len), dtype=np.int32)
+        if len(rows):
+            full = self.score_sequences(rows)
+            bucketed = self.score_by_bucket(rows)
+            diff = np.abs(full - bucketed)
+        
+        def verdicts(p):
+            return np.where(p > 0.7, 2, np.where(p < 0.3, 0, 1))
+        
+        self.bucket_validation = {
+            "mask_zero": masked,
+            "samples": int(len(rows)),
+            "max_abs_diff": round(float(diff.max()), 6) if len(rows) else 0.0,
+            "verdict_agreement": round(float(np.mean(verdicts(full) == verdicts(bucketed))), 4) if len(rows) else 1.0,
+            "tolerance": BUCKET_TOLERANCE
+        }
+        
+        if not masked and not len(rows):
+            self.length_buckets = []
+            print(f"Length buckets disabled: no usable texts in {BUCKET_CALIBRATION_PATH}")
+        elif not masked and self.bucket_validation["max_abs_diff"] > BUCKET_TOLERANCE:
+            self.length_buckets = []
+            print(f"Length buckets disabled: bucketed predictions differ by up to "
+                  f"{self.bucket_validation['max_abs_diff']:.4f} (tolerance {BUCKET_TOLERANCE})")
+        else:
+            print(f"Length buckets enabled: {self.length_buckets} "
+                  f"(max |dp| {self.bucket_validation['max_abs_diff']:.6f})")
+    
+    def warm_up(self):
+        """Run representative requests so the first user request isn't a cold start"""
+        # The lemmatizer loads WordNet lazily on its first call
+        _, padded_row = self.encoder.encode(WARMUP_TEXT)
+        padded_seq = padded_row[np.newaxis, :]
+        
+        # Trace the forward pass (and compile every batch shape when XLA is on)
+        if INFERENCE_XLA:
+            batch_sizes = set()
+            size = 1
+            while size <= max(BATCH_MAX_SIZE, BULK_CHUNK_SIZE):
+                batch_sizes.add(size)
+                size *= 2
+        else:
+            batch_sizes = {1, BATCH_MAX_SIZE}
+        for width in self.length_buckets + [max_len]:
+            for batch_size in sorted(batch_sizes):
+                self.score_sequences(np.repeat(padded_seq[:, max_len - width:], batch_size, axis=0))
+        
+        # One full request through the serving path
+        predict_news(WARMUP_TEXT, bundle=self)
+
+def activate_bundle(new_bundle):
+    """Atomically make new_bundle the serving version and retire the old one"""
+    global active_bundle, encoder, encoder_files
+    
+    with bundle_lock:
+        old_bundle, active_bundle = active_bundle, new_bundle
+        encoder, encoder_files = new_bundle.encoder, new_bundle.vocab_files
+    
+    # Requests that started on the old version finish on it
+    if old_bundle is not None:
+        threading.Thread(target=old_bundle.retire, name="model-retire", daemon=True).start()
+
+@contextmanager
+def serving_bundle():
+    """The active bundle, held so a swap doesn't release it under this request"""
+    with bundle_lock:
+        current = active_bundle
+        if current is not None:
+            current.acquire()
+    try:
+        yield current
+    finally:
+        if current is not None:
+            current.release()
+
 def load_model():
     """Load the trained model and tokenizer"""
-    global model, tokenizer
+    global verdict_cache
     
     try:
-        # Load the model
-        model = tf.keras.models.load_model('fake_news_detector.h5')
+        name, paths = resolve_model_version()
+        new_bundle = ModelBundle(name, paths).load()
+        
+        # Cache verdicts for repeated inputs; keys carry the model version,
+        # so one cache outlives hot swaps
+        if CACHE_ENABLED and verdict_cache is None:
+            verdict_cache = VerdictCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, CACHE_SHARED_PATH or None)
+        
+        activate_bundle(new_bundle)
+        start_url_ingestor()
+        start_model_watcher()
         
-        # Load the tokenizer
-        with open('tokenizer.pickle', 'rb') as handle:
-            tokenizer = pickle.load(handle)
-            
         print("Model and tokenizer loaded successfully!")
         return True
     except Exception as e:
         print(f"Error loading model: {e}")
         return False
 
-def predict_news(text):
-    """Predict if the given text is fake or real news"""
-    global model, tokenizer
+def reload_model(version=None):
+    """Load a model version, warm it up and hot-swap it in; None if a reload is running"""
+    global reload_status
+    
+    if not reload_lock.acquire(blocking=False):
+        return None
+    started = time.perf_counter()
+    new_bundle = None
+    try:
+        reload_status = {"state": "loading", "version": version, "started": time.time()}
+        name, paths = resolve_model_version(version)
+        new_bundle = ModelBundle(name, paths).load()
+        new_bundle.warm_up()
+        previous = active_bundle.version if active_bundle is not None else None
+        activate_bundle(new_bundle)
+        
+        MODEL_RELOADS.inc('success')
+        seconds = round(time.perf_counter() - started, 3)
+        print(f"Model {previous} replaced by {new_bundle.version} ({seconds}s)")
+        reload_status = {"state": "idle", "version": new_bundle.version, "previous": previous,
+                         "seconds": seconds, "finished": time.time()}
+    except Exception as e:
+        # The active version keeps serving
+        MODEL_RELOADS.inc('failure')
+        print(f"Model reload failed: {e}")
+        if new_bundle is not None:
+            new_bundle.close()
+        reload_status = {"state": "failed", "version": version, "error": str(e), "finished": time.time()}
+    finally:
+        reload_lock.release()
+    return reload_status
+
+def start_reload(version=None):
+    """Run reload_model() in a background thread; False if a reload is already running"""
+    if reload_lock.locked():
+        return False
+    threading.Thread(target=reload_model, args=(version,), name="model-reload", daemon=True).start()
+    return True
+
+def model_source_stamp():
+    """What the watcher compares: the CURRENT version name, or the flat files' mtimes"""
+    if MODEL_DIR:
+        with open(os.path.join(MODEL_DIR, 'CURRENT')) as handle:
+            return handle.read().strip()
+    _, paths = resolve_model_version()
+    return tuple(
+        os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        for path in sorted(set(paths.values()))
+    )
+
+def watch_model_source():
+    """Reload when the model source changes and has been stable for one interval"""
+    seen = model_source_stamp()
+    changed = None
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            stamp = model_source_stamp()
+        except OSError:
+            continue
+        if stamp == seen:
+            changed = None
+        elif stamp != changed:
+            # Files may still be being copied; check again next time
+            changed = stamp
+        elif reload_model() is not None:
+            # Failed versions aren't retried until the source changes again
+            seen, changed = stamp, None
+
+def start_model_watcher():
+    """Start polling for new model versions if AI_MODEL_WATCH_INTERVAL is set"""
+    global model_watcher
+    if MODEL_WATCH_INTERVAL > 0 and model_watcher is None:
+        model_watcher = threading.Thread(target=watch_model_source, name="model-watch", daemon=True)
+        model_watcher.start()
+
+def build_inference_fn(keras_model, variable_length=False):
+    """Wrap the model in a traced function with a fixed (batch, max_len) int32 signature"""
+    # With length buckets the sequence dimension varies too
+    seq_len = None if variable_length else max_len
+    
+    @tf.function(
+        input_signature=[tf.TensorSpec(shape=(None, seq_len), dtype=tf.int32)],
+        jit_compile=INFERENCE_XLA
+    )
+    def infer(padded_seqs):
+        return keras_model(padded_seqs, training=False)
     
-    if model is None or tokenizer is None:
-        return {"error": "Model not loaded"}
+    return infer
+
+def compiled_batch_size(n):
+    """Round a batch size up to a power of two so XLA only compiles a few shapes"""
+    size = 1
+    while size < n:
+        size *= 2
+    return size
+
+def model_loaded():
+    """Whether a model (Keras or TFLite) and the encoder are ready to score"""
+    return active_bundle is not None
+
+def inference_mode():
+    """Name of the active inference path, for /health"""
+    return active_bundle.inference_mode() if active_bundle is not None else None
+
+def warm_up():
+    """Run representative requests so the first user request isn't a cold start"""
+    global service_ready
     
+    started = time.perf_counter()
+    active_bundle.warm_up()
+    service_ready = True
+    print(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+    
+    # Job workers start (and resume spooled jobs) once the model is warm
+    if job_manager is not None:
+        job_manager.start()
+
+def predict_news(text, long_document=False, aggregation=None, bundle=None, explain=False):
+    """Predict if the given text is fake or real news"""
+    if bundle is not None:
+        return score_news(bundle, text, long_document, aggregation, explain)
+    
+    with serving_bundle() as current:
+        if current is None:
+            return {"error": "Model not loaded"}
+        return score_news(current, text, long_document, aggregation, explain)
+
+def score_news(bundle, text, long_document=False, aggregation=None, explain=False):
+    """predict_news() on a given model version"""
     try:
-        # Clean the text
-        cleaned_text = clean_text(text)
+        # Clean and tokenize the text in one pass
+        with STAGE_SECONDS.time('clean_tokenize'):
+            cleaned_text, ids = bundle.encoder.tokenize(text)
+        if isinstance(text, str):
+            INPUT_CHARS.observe(len(text))
+        INPUT_TOKENS.observe(len(ids))
         
         if not cleaned_text.strip():
+            PREDICTION_ERRORS.inc('empty_text')
             return {"error": "No valid text content found"}
         
-        # Tokenize and pad
-        seq = tokenizer.texts_to_sequences([cleaned_text])
-        padded_seq = pad_sequences(seq, maxlen=max_len)
-        
-        # Predict
-        prediction = model.predict(padded_seq, verbose=0)
-        probability = float(prediction[0][0])
-        
-        # Determine verdict
-        if probability > 0.7:
-            verdict = "fake"
-            confidence = probability * 100
-        elif probability < 0.3:
-            verdict = "real"
-            confidence = (1 - probability) * 100
+        if long_document and len(ids) > max_len:
+            # Score every part of the article instead of only its last max_len tokens
+            aggregation = aggregation or WINDOW_AGGREGATION
+            compute = lambda: score_long_document(bundle, cleaned_text, ids, aggregation)
+            variant = f"windows:{WINDOW_STRIDE}:{aggregation}"
         else:
-            verdict = "uncertain"
-            confidence = 50.0
-        
-        # Generate explanation
-        explanation = generate_explanation(verdict, probability, cleaned_text)
+            with STAGE_SECONDS.time('pad'):
+                padded_row = bundle.encoder.pad_into(ids, np.zeros(max_len, dtype=np.int32))
+            compute = lambda: score_encoded_text(bundle, cleaned_text, padded_row)
+            variant = result_variant(bundle)
         
-        # Calculate factors (mock values for now)
-        factors = {
-            "languagePattern": min(probability * 100, 95),
-            "accountCredibility": 75.0,
-            "contentConsistency": max((1 - probability) * 100, 25),
-            "temporalAnalysis": 60.0
-        }
-        
-        return {
-            "success": True,
-            "verdict": verdict,
-            "confidence": round(confidence, 2),
-            "probability": round(probability, 4),
-            "explanation": explanation,
-            "factors": factors,
-            "cleaned_text": cleaned_text[:200] + "..." if len(cleaned_text) > 200 else cleaned_text
-        }
+        if verdict_cache is None:
+            result = compute()
+        else:
+            # Identical texts share one cached (or in-flight) result
+            key = make_cache_key(cleaned_text, bundle.version, variant)
+            result = dict(verdict_cache.get_or_compute(key, compute))
+        result["model_version"] = bundle.version
         
+        # Attribution is computed per request and never cached. It explains
+        # the BiLSTM on the last max_len tokens, so it only replaces the
+        # explanation when that is what produced the verdict.
+        if explain:
+            with STAGE_SECONDS.time('attribution'):
+                attribution = explain_tokens(bundle, ids)
+            attribution["explains_verdict"] = result.get("decided_by") == 'bilstm' and "windows" not in result
+            result["attribution"] = attribution
+            if attribution["explains_verdict"]:
+                result["explanation"] = attribution_explanation(result["verdict"], attribution)
+        return result
+    
     except Exception as e:
         print(f"Error in prediction: {e}")
+        PREDICTION_ERRORS.inc('exception')
         return {"error": f"Prediction failed: {str(e)}"}
 
+def result_variant(bundle):
+    """Cache key variant for the cascade band, near-duplicate threshold and length buckets (all change the verdicts)"""
+    parts = []
+    if bundle.length_buckets:
+        parts.append("buckets:" + ",".join(str(width) for width in bundle.length_buckets))
+    if bundle.linear_model is not None:
+        parts.append(f"cascade:{CASCADE_BAND[0]}:{CASCADE_BAND[1]}")
+    if bundle.near_duplicates is not None:
+        parts.append(f"near_dup:{NEAR_DUP_THRESHOLD}")
+    return "|".join(parts)
+
+def escalates(linear_probability):
+    """Whether the linear first stage is too uncertain to decide alone"""
+    return CASCADE_BAND[0] <= linear_probability <= CASCADE_BAND[1]
+
+def find_near_duplicate(bundle, cleaned_text):
+    """(match, signature) from the near-duplicate index; both None when it is off or the text is too short"""
+    index = bundle.near_duplicates
+    if index is None:
+        return None, None
+    signature = index.signature(cleaned_text.split())
+    if signature is None:
+        NEAR_DUP_LOOKUPS.inc('skipped')
+        return None, None
+    match = index.lookup(signature)
+    NEAR_DUP_LOOKUPS.inc('hit' if match is not None else 'miss')
+    return match, signature
+
+def near_duplicate_result(match, cleaned_text):
+    """Result reusing the verdict of a near-duplicate text"""
+    result = build_result(match["probability"], cleaned_text, decided_by='near_duplicate')
+    result["near_duplicate"] = {
+        "matched": match["matched"],
+        "similarity": match["similarity"],
+        "age_seconds": match["age_seconds"]
+    }
+    return result
+
+def score_encoded_text(bundle, cleaned_text, padded_row):
+    """Score an encoded text and build its result"""
+    # Lightly edited copies of a recently scored text reuse its verdict
+    with STAGE_SECONDS.time('near_duplicate'):
+        match, signature = find_near_duplicate(bundle, cleaned_text)
+    if match is not None:
+        return near_duplicate_result(match, cleaned_text)
+    
+    probability, decided_by = classify_encoded_text(bundle, cleaned_text, padded_row)
+    if signature is not None:
+        bundle.near_duplicates.add(signature, probability, fingerprint(cleaned_text))
+    return build_result(probability, cleaned_text, decided_by=decided_by)
+
+def classify_encoded_text(bundle, cleaned_text, padded_row):
+    """(probability, deciding model) of an encoded text"""
+    # Clear-cut inputs are decided by the linear first stage
+    if bundle.linear_model is not None:
+        with STAGE_SECONDS.time('linear'):
+            linear_probability = float(bundle.linear_model.predict_proba([cleaned_text])[0, 1])
+        if not escalates(linear_probability):
+            CASCADE_DECISIONS.inc('linear')
+            return linear_probability, 'linear'
+        CASCADE_DECISIONS.inc('bilstm')
+    
+    with STAGE_SECONDS.time('inference'):
+        probability = bundle.predict_probability(padded_row)
+    return float(probability), 'bilstm'
+
+def window_bounds(n_tokens, stride=WINDOW_STRIDE):
+    """(start, end) of overlapping max_len-token windows covering n_tokens"""
+    stride = max(1, min(stride, max_len))
+    bounds = []
+    start = 0
+    while True:
+        end = min(start + max_len, n_tokens)
+        bounds.append((start, end))
+        if end == n_tokens:
+            return bounds
+        start += stride
+
+def score_long_document(bundle, cleaned_text, ids, aggregation):
+    """Score a long token sequence as overlapping windows and combine them"""
+    ids = np.asarray(ids, dtype=np.int32)
+    bounds = window_bounds(len(ids))
+    probabilities = np.empty(len(bounds), dtype=np.float32)
+    
+    # Windows are built and scored a chunk at a time so memory stays bounded
+    chunk = np.zeros((min(WINDOW_CHUNK, len(bounds)), max_len), dtype=np.int32)
+    for first in range(0, len(bounds), len(chunk)):
+        part = bounds[first:first + len(chunk)]
+        for row, (start, end) in zip(chunk, part):
+            # Pre-pad the (possibly shorter) last window, like pad_sequences
+            row[:max_len - (end - start)] = 0
+            row[max_len - (end - start):] = ids[start:end]
+        with STAGE_SECONDS.time('window_inference'):
+            probabilities[first:first + len(part)] = bundle.score_by_bucket(chunk[:len(part)])
+    
+    lengths = np.array([end - start for start, end in bounds], dtype=np.float32)
+    if aggregation == 'max':
+        probability = float(probabilities.max())
+    elif aggregation == 'weighted':
+        probability = float(np.dot(probabilities, lengths) / lengths.sum())
+    else:
+        probability = float(probabilities.mean())
+    
+    result = build_result(probability, cleaned_text)
+    result["token_count"] = int(len(ids))
+    result["aggregation"] = aggregation
+    result["windows"] = [
+        {"start": start, "end": end, "probability": round(float(p), 4)}
+        for (start, end), p in zip(bounds, probabilities)
+    ]
+    return result
+
+def predict_news_batch(texts):
+    """Predict a list of texts at once, returning results in input order"""
+    with serving_bundle() as current:
+        if current is None:
+            return {"error": "Model not loaded"}
+        results = score_news_batch(current, texts)
+    
+    for result in results:
+        if "error" not in result:
+            result["model_version"] = current.version
+    return results
+
+def score_news_batch(bundle, texts):
+    """predict_news_batch() on a given model version"""
+    results = [None] * len(texts)
+    
+    # Encode every text into one padded int array
+    with STAGE_SECONDS.time('batch_clean_tokenize'):
+        cleaned_texts, padded_seqs = bundle.encoder.encode_batch(texts)
+    for text in texts:
+        if isinstance(text, str):
+            INPUT_CHARS.observe(len(text))
+    
+    # Empty texts get a per-item error instead of failing the batch
+    pending = {}  # cleaned text -> indices of the texts that produced it
+    for i, cleaned_text in enumerate(cleaned_texts):
+        if not cleaned_text.strip():
+            PREDICTION_ERRORS.inc('empty_text')
+            results[i] = {"error": "No valid text content found"}
+            continue
+        pending.setdefault(cleaned_text, []).append(i)
+    
+    # Serve repeated texts from the verdict cache
+    keys = {}
+    if verdict_cache is not None:
+        for cleaned_text in list(pending):
+            keys[cleaned_text] = make_cache_key(cleaned_text, bundle.version, result_variant(bundle))
+            cached = verdict_cache.get(keys[cleaned_text])
+            if cached is not None:
+                for i in pending.pop(cleaned_text):
+                    results[i] = dict(cached)
+    
+    if not pending:
+        return results
+    
+    def finish(cleaned_text, result):
+        # Index freshly scored texts; copies within this batch aren't matched to each other
+        signature = signatures.pop(cleaned_text, None)
+        if signature is not None:
+            bundle.near_duplicates.add(signature, result["probability"], fingerprint(cleaned_text))
+        if verdict_cache is not None:
+            verdict_cache.put(keys[cleaned_text], result)
+        for i in pending[cleaned_text]:
+            results[i] = dict(result)
+    
+    # Reuse the verdicts of near-duplicates of recently scored texts
+    signatures = {}  # cleaned text -> signature to index once it is scored
+    valid_texts = []
+    with STAGE_SECONDS.time('batch_near_duplicate'):
+        for cleaned_text in pending:
+            match, signature = find_near_duplicate(bundle, cleaned_text)
+            if match is not None:
+                finish(cleaned_text, near_duplicate_result(match, cleaned_text))
+                continue
+            if signature is not None:
+                signatures[cleaned_text] = signature
+            valid_texts.append(cleaned_text)
+    if not valid_texts:
+        return results
+    
+    # Decide the clear-cut texts with one vectorized linear pass
+    if bundle.linear_model is not None:
+        with STAGE_SECONDS.time('batch_linear'):
+            linear_probabilities = bundle.linear_model.predict_proba(valid_texts)[:, 1]
+        escalated = []
+        for cleaned_text, probability in zip(valid_texts, linear_probabilities):
+            if escalates(probability):
+                escalated.append(cleaned_text)
+            else:
+                finish(cleaned_text, build_result(float(probability), cleaned_text, decided_by='linear'))
+        CASCADE_DECISIONS.inc('linear', amount=len(valid_texts) - len(escalated))
+        CASCADE_DECISIONS.inc('bilstm', amount=len(escalated))
+        valid_texts = escalated
+        if not valid_texts:
+            return results
+    
+    # Score one row per unique remaining text in chunked forward passes
+    rows = padded_seqs[[pending[cleaned_text][0] for cleaned_text in valid_texts]]
+    
+    for start in range(0, len(valid_texts), BULK_CHUNK_SIZE):
+        end = start + BULK_CHUNK_SIZE
+        try:
+            with STAGE_SECONDS.time('batch_inference'):
+                probabilities = bundle.score_by_bucket(rows[start:end])
+        except Exception as e:
+            print(f"Error in batch prediction: {e}")
+            PREDICTION_ERRORS.inc('exception', amount=end - start)
+            for cleaned_text in valid_texts[start:end]:
+                for i in pending[cleaned_text]:
+                    results[i] = {"error": f"Prediction failed: {str(e)}"}
+            continue
+        
+        for cleaned_text, probability in zip(valid_texts[start:end], probabilities):
+            finish(cleaned_text, build_result(float(probability), cleaned_text))
+    
+    return results
+
+def build_result(probability, cleaned_text, decided_by='bilstm'):
+    """Turn a model probability into the verdict response"""
+    # Determine verdict
+    if probability > 0.7:
+        verdict = "fake"
+        confidence = probability * 100
+    elif probability < 0.3:
+        verdict = "real"
+        confidence = (1 - probability) * 100
+    else:
+        verdict = "uncertain"
+        confidence = 50.0
+    
+    # Generate explanation
+    with STAGE_SECONDS.time('explanation'):
+        explanation = generate_explanation(verdict, probability, cleaned_text)
+    
+    # Calculate factors (mock values for now)
+    factors = {
+        "languagePattern": min(probability * 100, 95),
+        "accountCredibility": 75.0,
+        "contentConsistency": max((1 - probability) * 100, 25),
+        "temporalAnalysis": 60.0
+    }
+    
+    return {
+        "success": True,
+        "verdict": verdict,
+        "confidence": round(confidence, 2),
+        "probability": round(probability, 4),
+        "explanation": explanation,
+        "factors": factors,
+        "decided_by": decided_by,
+        "cleaned_text": cleaned_text[:200] + "..." if len(cleaned_text) > 200 else cleaned_text
+    }
+
+def explain_tokens(bundle, ids):
+    """Words that moved the BiLSTM probability most, by batched occlusion"""
+    started = time.perf_counter()
+    attribution = occlusion_attribution(bundle.score_by_bucket, ids, max_len, EXPLAIN_MAX_ROWS,
+                                        EXPLAIN_CHUNK, EXPLAIN_BUDGET_MS / 1000)
+    words = bundle.encoder.words(ids[-max_len:])
+    spans = sorted(attribution["spans"], key=lambda span: abs(span[2]), reverse=True)[:EXPLAIN_TOP_K]
+    
+    return {
+        "model": "bilstm",
+        "probability": round(attribution["probability"], 4),
+        "top_words": [
+            {"text": ' '.join(words[start:end]), "position": start, "delta": round(delta, 4)}
+            for start, end, delta in spans
+        ],
+        "span_width": attribution["span_width"],
+        "spans_scored": len(attribution["spans"]),
+        "spans_total": attribution["spans_total"],
+        "complete": len(attribution["spans"]) == attribution["spans_total"],
+        "overhead_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def attribution_explanation(verdict, attribution):
+    """Explanation naming the words that pushed the verdict each way"""
+    # A repeated word can appear at several positions
+    toward_fake = list(dict.fromkeys(word["text"] for word in attribution["top_words"] if word["delta"] > 0))[:3]
+    toward_real = list(dict.fromkeys(word["text"] for word in attribution["top_words"] if word["delta"] < 0))[:3]
+    
+    parts = [f"The content was judged {verdict}."]
+    if toward_fake:
+        parts.append("Words pushing toward fake: " + ", ".join(f'"{word}"' for word in toward_fake) + ".")
+    if toward_real:
+        parts.append("Words pushing toward real: " + ", ".join(f'"{word}"' for word in toward_real) + ".")
+    if not attribution["complete"]:
+        parts.append(f"Only {attribution['spans_scored']} of {attribution['spans_total']} spans were checked in time.")
+    return " ".join(parts)
+
 def generate_explanation(verdict, probability, text):
     """Generate explanation for the prediction"""
     if verdict == "fake":
@@ -170,14 +1131,186 @@ def extract_tweet_content(url):
     except Exception as e:
         return {"error": f"Error extracting tweet content: {str(e)}"}
 
+def score_job_chunk(texts):
+    """Score one chunk of a background job, holding a bulk admission slot if admission control is on"""
+    if admission is None:
+        return predict_news_batch(texts)
+    
+    from admission import Rejected
+    while True:
+        try:
+            ticket = admission.acquire('bulk')
+            break
+        except Rejected as e:
+            time.sleep(e.retry_after)
+    try:
+        return predict_news_batch(texts)
+    finally:
+        admission.release(ticket)
+
+def start_url_ingestor():
+    """Start the async tweet fetcher if a fetch URL is configured"""
+    global url_ingestor
+    if TWEET_FETCH_URL and url_ingestor is None:
+        from url_ingest import UrlIngestor
+        url_ingestor = UrlIngestor(
+            TWEET_FETCH_URL,
+            timeout=FETCH_TIMEOUT,
+            per_host_limit=FETCH_PER_HOST_LIMIT,
+            cache_ttl=FETCH_CACHE_TTL
+        ).start()
+
+def fetch_tweets(urls):
+    """Fetch tweet content for several URLs concurrently, in input order"""
+    if url_ingestor is None:
+        return [extract_tweet_content(url) for url in urls]
+    return url_ingestor.fetch_many(urls)
+
+def response_timestamp():
+    """Current UTC time in the format responses have always used (np.datetime64('now'))"""
+    global last_timestamp
+    now = int(time.time())
+    if last_timestamp[0] != now:
+        last_timestamp = (now, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)))
+    return last_timestamp[1]
+
+def response_id():
+    """Random 7-digit response id"""
+    return str(random.randrange(1000000, 9999999))
+
+def requested_fields(data):
+    """Result fields the caller asked for ("fields" in the body or query string), or None for all"""
+    fields = data.get('fields') if isinstance(data, dict) else None
+    if fields is None:
+        fields = request.args.get('fields')
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if not isinstance(fields, list) or not fields or not all(isinstance(field, str) for field in fields):
+        raise ValueError("'fields' must be a non-empty array of field names")
+    return frozenset(fields)
+
+def select_fields(result, fields):
+    """Keep only the requested fields of a result; errors are returned whole"""
+    if fields is None or "error" in result:
+        return result
+    return {key: value for key, value in result.items() if key in fields}
+
+def wants_msgpack():
+    """Whether the client prefers MessagePack (Accept header or ?format=msgpack)"""
+    if request.args.get('format') == 'msgpack':
+        return True
+    best = request.accept_mimetypes.best_match(('application/json',) + MSGPACK_MIMETYPES)
+    return best in MSGPACK_MIMETYPES
+
+def respond(payload, status=200):
+    """JSON (or MessagePack) response, timing the serialization"""
+    with STAGE_SECONDS.time('serialization'):
+        if not wants_msgpack():
+            return jsonify(payload), status
+        if msgpack is None:
+            return jsonify({"error": "MessagePack responses need the msgpack package"}), 406
+        response = Response(msgpack.packb(payload, use_bin_type=True), mimetype=MSGPACK_MIMETYPES[0])
+    return response, status
+
+@app.before_request
+def start_request_metrics():
+    """Count /analyze* requests in flight and start their timer"""
+    if request.path.startswith('/analyze'):
+        g.request_started = time.perf_counter()
+        IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the latency and status of /analyze* requests"""
+    started = g.get('request_started')
+    if started is not None:
+        # The route template keeps the label set small (unknown paths share one)
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route)
+        REQUESTS.inc(route, str(response.status_code))
+        if response.status_code >= 400:
+            REQUEST_ERRORS.inc(route)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """Runs even when a request fails, so the in-flight count stays right"""
+    if g.pop('request_started', None) is not None:
+        IN_FLIGHT.dec()
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "model_loaded": model is not None,
-        "tokenizer_loaded": tokenizer is not None
-    })
+    current = active_bundle
+    return respond({
+        "status": "healthy" if service_ready else "warming_up",
+        "ready": service_ready,
+        "inference_mode": inference_mode(),
+        "model_loaded": current is not None,
+        "tokenizer_loaded": encoder is not None,
+        "model_version": current.version if current is not None else None,
+        "model_reload": reload_status,
+        "length_buckets": {
+            "active": current.length_buckets,
+            "validation": current.bucket_validation
+        } if LENGTH_BUCKETS and current is not None else None,
+        "cascade": {
+            "band": list(CASCADE_BAND),
+            "model": current.paths["cascade"]
+        } if current is not None and current.linear_model is not None else None,
+        "near_duplicates": current.near_duplicates.stats() if current is not None and current.near_duplicates is not None else None,
+        "batching": current.batcher.stats() if current is not None and current.batcher is not None else None,
+        "cache": verdict_cache.stats() if verdict_cache is not None else None,
+        "admission": admission.stats() if admission is not None else None,
+        "jobs": job_manager.stats() if job_manager is not None else None,
+        "url_ingest": url_ingestor.stats() if url_ingestor is not None else None
+    }, 200 if service_ready else 503)
+
+def admin_authorized():
+    """Whether the request carries AI_ADMIN_TOKEN (never true when it isn't set)"""
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load a model version in the background and hot-swap it in"""
+    # The service listens on all interfaces, so the route stays closed
+    # until a token is configured
+    if not ADMIN_TOKEN:
+        return respond({"error": "/admin/reload is disabled: set AI_ADMIN_TOKEN to enable it"}, 403)
+    if not admin_authorized():
+        return respond({"error": "Unauthorized"}, 401)
+    
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if version is not None and not MODEL_DIR:
+        return respond({"error": "'version' needs a versioned model directory (AI_MODEL_DIR)"}, 400)
+    if version is not None:
+        if not isinstance(version, str):
+            return respond({"error": "'version' must be a string"}, 400)
+        try:
+            resolve_model_version(version)
+        except (ValueError, FileNotFoundError) as e:
+            return respond({"error": str(e)}, 400)
+    
+    # Deploy scripts can wait for the swap instead of polling /health
+    if data.get('wait'):
+        status = reload_model(version)
+        if status is None:
+            return respond({"error": "A model reload is already running"}, 409)
+        return respond(status, 200 if status["state"] == "idle" else 500)
+    
+    if not start_reload(version):
+        return respond({"error": "A model reload is already running"}, 409)
+    return respond({"state": "loading", "version": version}, 202)
 
 @app.route('/analyze/text', methods=['POST'])
 def analyze_text():
@@ -186,27 +1319,37 @@ def analyze_text():
         data = request.get_json()
         
         if not data or 'text' not in data:
-            return jsonify({"error": "Text content is required"}), 400
+            return respond({"error": "Text content is required"}, 400)
         
         text = data['text']
         
         if not text or not text.strip():
-            return jsonify({"error": "Text content cannot be empty"}), 400
+            return respond({"error": "Text content cannot be empty"}, 400)
+        
+        aggregation = data.get('aggregation')
+        if aggregation is not None and aggregation not in WINDOW_AGGREGATIONS:
+            return respond({"error": f"'aggregation' must be one of {', '.join(WINDOW_AGGREGATIONS)}"}, 400)
         
-        result = predict_news(text)
+        try:
+            fields = requested_fields(data)
+        except ValueError as e:
+            return respond({"error": str(e)}, 400)
+        
+        result = predict_news(text, long_document=bool(data.get('long_document')), aggregation=aggregation,
+                              explain=bool(data.get('explain')))
         
         if "error" in result:
-            return jsonify(result), 500
+            return respond(result, 500)
         
         # Add metadata
         result["input_type"] = "text"
-        result["timestamp"] = str(np.datetime64('now'))
-        result["id"] = str(np.random.randint(1000000, 9999999))
+        result["timestamp"] = response_timestamp()
+        result["id"] = response_id()
         
-        return jsonify(result)
+        return respond(select_fields(result, fields))
         
     except Exception as e:
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return respond({"error": f"Server error: {str(e)}"}, 500)
 
 @app.route('/analyze/url', methods=['POST'])
 def analyze_url():
@@ -215,39 +1358,151 @@ def analyze_url():
         data = request.get_json()
         
         if not data or 'url' not in data:
-            return jsonify({"error": "URL is required"}), 400
+            return respond({"error": "URL is required"}, 400)
         
         url = data['url']
         
         if not url or not url.strip():
-            return jsonify({"error": "URL cannot be empty"}), 400
+            return respond({"error": "URL cannot be empty"}, 400)
+        
+        try:
+            fields = requested_fields(data)
+        except ValueError as e:
+            return respond({"error": str(e)}, 400)
         
         # Extract content from URL
-        tweet_data = extract_tweet_content(url)
+        tweet_data = fetch_tweets([url])[0]
         
         if "error" in tweet_data:
-            return jsonify(tweet_data), 400
+            return respond(tweet_data, 400)
         
         # Analyze the extracted content
         result = predict_news(tweet_data["content"])
         
         if "error" in result:
-            return jsonify(result), 500
+            return respond(result, 500)
         
         # Add metadata
         result["input_type"] = "url"
-        result["timestamp"] = str(np.datetime64('now'))
-        result["id"] = str(np.random.randint(1000000, 9999999))
+        result["timestamp"] = response_timestamp()
+        result["id"] = response_id()
         result["source_url"] = url
         result["tweet_metadata"] = {
             "author": tweet_data.get("author"),
             "timestamp": tweet_data.get("timestamp")
         }
         
-        return jsonify(result)
+        return respond(select_fields(result, fields))
         
     except Exception as e:
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return respond({"error": f"Server error: {str(e)}"}, 500)
+
+@app.route('/analyze/urls', methods=['POST'])
+def analyze_urls():
+    """Analyze a list of Twitter URLs, fetching them concurrently"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'urls' not in data:
+            return respond({"error": "A 'urls' array is required"}, 400)
+        
+        urls = data['urls']
+        
+        if not isinstance(urls, list) or not urls:
+            return respond({"error": "'urls' must be a non-empty array"}, 400)
+        
+        if len(urls) > URL_BATCH_MAX_ITEMS:
+            return respond({"error": f"At most {URL_BATCH_MAX_ITEMS} URLs are allowed per request"}, 413)
+        
+        try:
+            fields = requested_fields(data)
+        except ValueError as e:
+            return respond({"error": str(e)}, 400)
+        
+        # Fetch everything first, then score the fetched texts as one batch
+        tweets = fetch_tweets(urls)
+        fetched = [i for i, tweet_data in enumerate(tweets) if "error" not in tweet_data]
+        scores = predict_news_batch([tweets[i]["content"] for i in fetched]) if fetched else []
+        
+        if isinstance(scores, dict):
+            return respond(scores, 500)
+        
+        results = [dict(tweet_data) if "error" in tweet_data else None for tweet_data in tweets]
+        for i, result in zip(fetched, scores):
+            results[i] = result
+            if "error" not in result:
+                result["tweet_metadata"] = {
+                    "author": tweets[i].get("author"),
+                    "timestamp": tweets[i].get("timestamp")
+                }
+        
+        # Add metadata
+        timestamp = response_timestamp()
+        for i, result in enumerate(results):
+            result["index"] = i
+            result["id"] = response_id()
+            result["input_type"] = "url"
+            result["source_url"] = urls[i]
+            result["timestamp"] = timestamp
+        
+        return respond({
+            "success": True,
+            "count": len(results),
+            "failed": sum(1 for result in results if "error" in result),
+            "results": [select_fields(result, fields) for result in results]
+        })
+        
+    except Exception as e:
+        return respond({"error": f"Server error: {str(e)}"}, 500)
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze a list of texts in one request"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'texts' not in data:
+            return respond({"error": "A 'texts' array is required"}, 400)
+        
+        texts = data['texts']
+        ids = data.get('ids')
+        
+        if not isinstance(texts, list) or not texts:
+            return respond({"error": "'texts' must be a non-empty array"}, 400)
+        
+        if len(texts) > BULK_MAX_ITEMS:
+            return respond({"error": f"At most {BULK_MAX_ITEMS} texts are allowed per batch"}, 413)
+        
+        if ids is not None and (not isinstance(ids, list) or len(ids) != len(texts)):
+            return respond({"error": "'ids' must be an array with one id per text"}, 400)
+        
+        try:
+            fields = requested_fields(data)
+        except ValueError as e:
+            return respond({"error": str(e)}, 400)
+        
+        results = predict_news_batch(texts)
+        
+        if isinstance(results, dict):
+            return respond(results, 500)
+        
+        # Add metadata
+        timestamp = response_timestamp()
+        for i, result in enumerate(results):
+            result["index"] = i
+            result["id"] = str(ids[i]) if ids is not None else response_id()
+            result["input_type"] = "text"
+            result["timestamp"] = timestamp
+        
+        return respond({
+            "success": True,
+            "count": len(results),
+            "failed": sum(1 for result in results if "error" in result),
+            "results": [select_fields(result, fields) for result in results]
+        })
+        
+    except Exception as e:
+        return respond({"error": f"Server error: {str(e)}"}, 500)
 
 @app.route('/analyze', methods=['POST'])
 def analyze_content():
@@ -256,7 +1511,7 @@ def analyze_content():
         data = request.get_json()
         
         if not data:
-            return jsonify({"error": "Request body is required"}), 400
+            return respond({"error": "Request body is required"}, 400)
         
         # Check if it's a URL or text
         if 'url' in data and data['url']:
@@ -264,14 +1519,41 @@ def analyze_content():
         elif 'text' in data and data['text']:
             return analyze_text()
         else:
-            return jsonify({"error": "Either 'url' or 'text' is required"}), 400
+            return respond({"error": "Either 'url' or 'text' is required"}, 400)
             
     except Exception as e:
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return respond({"error": f"Server error: {str(e)}"}, 500)
+
+# Admission hooks only exist when admission control is enabled. They are
+# installed before profiling so shed requests are never profiled.
+if ADMISSION_ENABLED:
+    from admission import AdmissionController, Lane, install_admission
+    admission = AdmissionController([
+        Lane('interactive', ADMISSION_CONCURRENCY, ADMISSION_INTERACTIVE_QUEUE, ADMISSION_INTERACTIVE_DEADLINE_MS),
+        Lane('bulk', ADMISSION_BULK_CONCURRENCY, ADMISSION_BULK_QUEUE, ADMISSION_BULK_DEADLINE_MS)
+    ], ADMISSION_CONCURRENCY)
+    install_admission(app, admission, BULK_ROUTES, metrics, admin_authorized)
+
+# Job routes only exist when the job API is enabled
+if JOBS_ENABLED:
+    from jobs import JobManager, install_jobs
+    job_manager = JobManager(JOBS_DIR, score_job_chunk, JOBS_WORKERS, JOBS_CHUNK_SIZE, JOBS_MAX_ROWS,
+                             JOBS_RETENTION_HOURS * 3600, chunk_retries=JOBS_CHUNK_RETRIES, registry=metrics)
+    install_jobs(app, job_manager, requested_fields, admin_authorized)
+
+# Profiling hooks and admin routes only exist when profiling is enabled
+if PROFILING_ENABLED:
+    from profiling import RequestProfiler, install_profiling
+    install_profiling(
+        app,
+        RequestProfiler(PROFILE_DIR, PROFILE_MAX_ENTRIES, PROFILE_SAMPLE_RATE, PROFILE_TF_TRACE),
+        admin_authorized
+    )
 
 if __name__ == '__main__':
     # Load model on startup
     if load_model():
+        warm_up()
         print("AI Service started successfully!")
         app.run(host='0.0.0.0', port=5000, debug=False)
     else:
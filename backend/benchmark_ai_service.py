@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Offline performance benchmarks for the AI service.
+
+Builds a tiny stand-in model and tokenizer with the same interface as
+fake_news_detector.h5 / tokenizer.pickle in a temporary directory, so it
+runs anywhere without the real artifacts, and measures:
+
+- micro-benchmarks of clean_text, the full TextEncoder encode (cleaning,
+  token lookup and padding), padding alone and predict_news, each on its own;
+- an in-process load test of /analyze/text at several concurrency levels
+  (p50/p95/p99 latency and throughput).
+
+Results are written as JSON and checked against regression thresholds;
+the exit status is 1 if any threshold is exceeded. After an intentional
+performance change, or on a new CI machine, regenerate the thresholds
+with --write-thresholds.
+
+Usage:
+    python benchmark_ai_service.py [--output benchmark_results.json]
+                                   [--thresholds benchmark_thresholds.json]
+    python benchmark_ai_service.py --write-thresholds
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import ai_service
+from loadtest import WORDS, percentile
+from text_encoder import save_vocabulary
+
+SEED = 1234
+STAND_IN_VOCABULARY = 5000
+# Same vocabulary limit as the production tokenizer
+NUM_WORDS = 10000
+
+# Micro-benchmarks run in rounds; the best round's median is what gets
+# compared, which filters out noise from other processes on the machine
+MICRO_ROUNDS = 5
+
+# Slack allowed by --write-thresholds on top of the measured values
+LATENCY_HEADROOM = 2.0
+THROUGHPUT_HEADROOM = 0.5
+
+
+def make_vocabulary(rng, size):
+    """Real news words plus random letter-only words"""
+    words = set(WORDS)
+    while len(words) < size:
+        words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def make_text(rng, vocabulary, min_words, max_words):
+    """Random text with punctuation, digits and capitals like real posts"""
+    words = []
+    for _ in range(rng.randint(min_words, max_words)):
+        word = rng.choice(vocabulary)
+        roll = rng.random()
+        if roll < 0.1:
+            word = word.capitalize()
+        elif roll < 0.15:
+            word += rng.choice(',.!?')
+        elif roll < 0.18:
+            word = str(rng.randint(1, 2024))
+        words.append(word)
+    return ' '.join(words)
+
+
+def build_stand_in(directory, rng, vocabulary):
+    """Write a small model, tokenizer and vocabulary with the real interface"""
+    tf = ai_service.import_tensorflow()
+    from tensorflow.keras.preprocessing.text import Tokenizer
+
+    tokenizer = Tokenizer(num_words=NUM_WORDS)
+    tokenizer.fit_on_texts([make_text(rng, vocabulary, 20, 80).lower() for _ in range(2000)])
+    with open(os.path.join(directory, 'tokenizer.pickle'), 'wb') as handle:
+        pickle.dump(tokenizer, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    save_vocabulary(tokenizer, os.path.join(directory, 'tokenizer_vocab.npy'))
+
+    # Same input / output contract as the production BiLSTM, just smaller
+    tf.keras.utils.set_random_seed(SEED)
+    model = tf.keras.Sequential([
+        tf.keras.layers.Embedding(NUM_WORDS, 32),
+        tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(16)),
+        tf.keras.layers.Dense(1, activation='sigmoid')
+    ])
+    model.build(input_shape=(None, ai_service.max_len))
+    model.save(os.path.join(directory, 'fake_news_detector.h5'))
+
+
+class IdentityLemmatizer:
+    """Stand-in for WordNetLemmatizer when the WordNet data is missing"""
+
+    def lemmatize(self, word, pos='n'):
+        return word
+
+
+def text_tools_available():
+    """Whether the NLTK stopwords and WordNet data are installed"""
+    from nltk.corpus import stopwords, wordnet
+    try:
+        stopwords.words('english')
+        wordnet.ensure_loaded()
+        return True
+    except (LookupError, OSError):
+        return False
+
+
+def load_fallback_text_tools():
+    """Offline stand-ins: scikit-learn's stop words and no lemmatization"""
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    ai_service.stop_words = set(ENGLISH_STOP_WORDS)
+    ai_service.lemmatizer = IdentityLemmatizer()
+
+
+def configure_service(directory):
+    """Point the service at the stand-in artifacts and load it"""
+    ai_service.MODEL_PATH = os.path.join(directory, 'fake_news_detector.h5')
+    ai_service.VOCAB_PATH = os.path.join(directory, 'tokenizer_vocab.npy')
+    ai_service.TOKENIZER_PATH = os.path.join(directory, 'tokenizer.pickle')
+    ai_service.INFERENCE_BACKEND = 'keras'
+    ai_service.LENGTH_BUCKETS = []
+    # Repeated benchmark inputs must not be served from the verdict cache
+    ai_service.CACHE_ENABLED = False
+
+    text_tools = 'nltk' if text_tools_available() else 'fallback'
+    if text_tools == 'fallback':
+        print("NLTK data not installed, using fallback stop words and no lemmatization")
+        ai_service.load_text_tools = load_fallback_text_tools
+
+    if not ai_service.load_model():
+        raise SystemExit("Could not load the stand-in model")
+    ai_service.warm_up()
+    return text_tools
+
+
+def time_calls(fn, inputs, iterations):
+    """Per-call latency statistics in microseconds"""
+    timings = []
+    round_medians = []
+    per_round = max(1, iterations // MICRO_ROUNDS)
+    for start in range(0, per_round * MICRO_ROUNDS, per_round):
+        round_timings = []
+        for i in range(start, start + per_round):
+            item = inputs[i % len(inputs)]
+            started = time.perf_counter()
+            fn(item)
+            round_timings.append(time.perf_counter() - started)
+        timings.extend(round_timings)
+        round_medians.append(percentile(sorted(round_timings), 0.50))
+    timings.sort()
+    return {
+        "iterations": len(timings),
+        "mean_us": round(sum(timings) / len(timings) * 1e6, 2),
+        "p50_us": round(min(round_medians) * 1e6, 2),
+        "p95_us": round(percentile(timings, 0.95) * 1e6, 2),
+    }
+
+
+def run_micro(rng, vocabulary, iterations):
+    """Benchmark the request stages one at a time"""
+    tweets = [make_text(rng, vocabulary, 15, 40) for _ in range(200)]
+    articles = [make_text(rng, vocabulary, 300, 800) for _ in range(50)]
+    results = {}
+
+    for name, texts in (("tweet", tweets), ("article", articles)):
+        results[f"clean_text_{name}"] = time_calls(ai_service.clean_text, texts, iterations)
+        # The whole encode step: cleaning, token lookup and padding
+        results[f"encode_{name}"] = time_calls(ai_service.encoder.encode, texts, iterations)
+        # Padding alone, on ids tokenized up front
+        row = np.zeros(ai_service.encoder.max_len, dtype=np.int32)
+        token_ids = [ai_service.encoder.tokenize(text)[1] for text in texts]
+        results[f"pad_{name}"] = time_calls(lambda ids: ai_service.encoder.pad_into(ids, row), token_ids,
+                                            iterations)
+
+    # Score on the calling thread: through the micro-batcher a lone caller
+    # would mostly measure the batching window
+    bundle = ai_service.active_bundle
+    batcher, bundle.batcher = bundle.batcher, None
+    try:
+        results["predict_news_tweet"] = time_calls(ai_service.predict_news, tweets, max(1, iterations // 10))
+    finally:
+        bundle.batcher = batcher
+    return results
+
+
+def run_load(rng, vocabulary, concurrency, total_requests):
+    """Drive /analyze/text through Flask's test client from several threads"""
+    bodies = [{"text": make_text(rng, vocabulary, 15, 40)} for _ in range(total_requests)]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    next_request = [0]
+
+    def worker():
+        client = ai_service.app.test_client()
+        local = []
+        while True:
+            with lock:
+                if next_request[0] >= total_requests:
+                    break
+                body = bodies[next_request[0]]
+                next_request[0] += 1
+            started = time.perf_counter()
+            response = client.post('/analyze/text', json=body)
+            elapsed = time.perf_counter() - started
+            if response.status_code == 200:
+                local.append(elapsed)
+            else:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def derive_thresholds(results):
+    """Thresholds with headroom over the measured results"""
+    return {
+        "micro": {
+            name: {"max_p50_us": round(stats["p50_us"] * LATENCY_HEADROOM, 1)}
+            for name, stats in results["micro"].items()
+        },
+        "load": {
+            str(run["concurrency"]): {
+                "min_throughput_rps": round(run["throughput_rps"] * THROUGHPUT_HEADROOM, 1),
+                "max_p99_ms": round(run["p99_ms"] * LATENCY_HEADROOM, 1),
+                "max_errors": 0
+            }
+            for run in results["load"]
+        }
+    }
+
+
+def check_thresholds(results, thresholds):
+    """List of human-readable threshold violations"""
+    failures = []
+    for name, limits in thresholds.get("micro", {}).items():
+        stats = results["micro"].get(name)
+        if stats and stats["p50_us"] > limits["max_p50_us"]:
+            failures.append(f"{name}: p50 {stats['p50_us']} us > {limits['max_p50_us']} us")
+
+    for run in results["load"]:
+        limits = thresholds.get("load", {}).get(str(run["concurrency"]))
+        if not limits:
+            continue
+        label = f"load c={run['concurrency']}"
+        if run["throughput_rps"] < limits["min_throughput_rps"]:
+            failures.append(f"{label}: {run['throughput_rps']} req/s < {limits['min_throughput_rps']} req/s")
+        if run["p99_ms"] > limits["max_p99_ms"]:
+            failures.append(f"{label}: p99 {run['p99_ms']} ms > {limits['max_p99_ms']} ms")
+        if run["errors"] > limits.get("max_errors", 0):
+            failures.append(f"{label}: {run['errors']} errors")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI service offline")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--thresholds', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             'benchmark_thresholds.json'))
+    parser.add_argument('--write-thresholds', action='store_true',
+                        help="Store thresholds derived from this run instead of checking them")
+    parser.add_argument('--iterations', type=int, default=2000, help="Calls per micro-benchmark")
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma-separated load test levels")
+    parser.add_argument('--requests', type=int, default=400, help="Requests per load test level")
+    args = parser.parse_args()
+
+    rng = random.Random(SEED)
+    vocabulary = make_vocabulary(rng, STAND_IN_VOCABULARY)
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_stand_in(directory, rng, vocabulary)
+        text_tools = configure_service(directory)
+
+        results = {
+            "environment": {
+                "python": platform.python_version(),
+                "tensorflow": ai_service.tf.__version__,
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "text_tools": text_tools,
+            },
+            "config": {
+                "inference_mode": ai_service.inference_mode(),
+                "batching": ai_service.active_bundle.batcher is not None,
+                "batch_max_size": ai_service.BATCH_MAX_SIZE,
+                "batch_max_wait_ms": ai_service.BATCH_MAX_WAIT_MS,
+            },
+            "micro": run_micro(rng, vocabulary, args.iterations),
+            "load": [
+                run_load(rng, vocabulary, int(level), args.requests)
+                for level in args.concurrency.split(',')
+            ],
+        }
+
+    if args.write_thresholds:
+        with open(args.thresholds, 'w') as handle:
+            json.dump(derive_thresholds(results), handle, indent=2)
+            handle.write('\n')
+        print(f"Thresholds written to {args.thresholds}")
+        failures = []
+    elif os.path.exists(args.thresholds):
+        with open(args.thresholds) as handle:
+            failures = check_thresholds(results, json.load(handle))
+    else:
+        print(f"No thresholds file at {args.thresholds}, skipping regression checks")
+        failures = []
+
+    results["regressions"] = failures
+    with open(args.output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+        handle.write('\n')
+
+    for name, stats in results["micro"].items():
+        print(f"{name:<24} p50 {stats['p50_us']:>10.1f} us   p95 {stats['p95_us']:>10.1f} us")
+    for run in results["load"]:
+        print(f"load c={run['concurrency']:<3} {run['throughput_rps']:>8.1f} req/s   "
+              f"p50 {run['p50_ms']:.1f} ms   p95 {run['p95_ms']:.1f} ms   p99 {run['p99_ms']:.1f} ms")
+    print(f"Results written to {args.output}")
+
+    if failures:
+        print("Performance regressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
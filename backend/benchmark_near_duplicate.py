@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency benchmark for the near-duplicate index.
+
+Generates a synthetic paraphrase corpus of cleaned token lists:
+- source posts drawn from a Zipf-distributed vocabulary grouped by topic;
+- edited copies of each source at several edit rates (word substitutions,
+  deletions, insertions and reorderings);
+- unrelated posts on the same topics, as hard negatives.
+
+It indexes the sources and reports, per edit rate:
+- the hit rate (the copy is matched to its own source);
+- the share of copies whose true Jaccard similarity is at or above the
+  threshold;
+- the wrong-match rate (matched to a text other than its own source);
+- the below-threshold rate (matched to its source although their true
+  Jaccard similarity is under the threshold, from estimation noise).
+
+It then fills an index to --entries items and measures signature, insert
+and lookup latency at that size.
+
+Usage:
+    python benchmark_near_duplicate.py [--threshold 0.8] [--entries 2000000]
+                                       [--output near_duplicate_results.json]
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+
+import numpy as np
+
+from loadtest import percentile
+from near_duplicate import NearDuplicateIndex, fingerprint
+
+SEED = 1234
+TOPICS = 50
+WORDS_PER_TOPIC = 400
+SHARED_WORDS = 2000
+EDIT_RATES = (0.05, 0.1, 0.2, 0.3, 0.5)
+
+
+class Vocabulary:
+    """Topic-specific words plus a shared pool, all letter-only like clean_text output
+
+    Words are drawn with Zipf (1/rank) frequencies, so common words recur
+    across unrelated posts the way they do in real ones.
+    """
+
+    def __init__(self, rng):
+        words = set()
+        while len(words) < TOPICS * WORDS_PER_TOPIC + SHARED_WORDS:
+            words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))))
+        words = sorted(words)
+        rng.shuffle(words)
+        self.topics = [words[i * WORDS_PER_TOPIC:(i + 1) * WORDS_PER_TOPIC] for i in range(TOPICS)]
+        self.shared = words[TOPICS * WORDS_PER_TOPIC:]
+        self._topic_weights = self._cumulative_weights(WORDS_PER_TOPIC)
+        self._shared_weights = self._cumulative_weights(SHARED_WORDS)
+
+    @staticmethod
+    def _cumulative_weights(n):
+        return list(np.cumsum(1.0 / np.arange(1, n + 1)))
+
+    def word(self, rng, topic):
+        """A topic word 70% of the time, otherwise a shared one"""
+        if rng.random() < 0.7:
+            return rng.choices(self.topics[topic], cum_weights=self._topic_weights)[0]
+        return rng.choices(self.shared, cum_weights=self._shared_weights)[0]
+
+
+def make_post(rng, vocabulary):
+    """(topic, cleaned tokens) of one post"""
+    topic = rng.randrange(TOPICS)
+    return topic, [vocabulary.word(rng, topic) for _ in range(rng.randint(20, 60))]
+
+
+def edit_post(rng, tokens, rate, vocabulary, topic):
+    """A reworded copy: substitute, delete, insert or move about rate * len(tokens) words"""
+    tokens = list(tokens)
+    for _ in range(max(1, int(round(rate * len(tokens))))):
+        operation = rng.random()
+        position = rng.randrange(len(tokens))
+        replacement = vocabulary.word(rng, topic)
+        if operation < 0.4:
+            tokens[position] = replacement
+        elif operation < 0.6 and len(tokens) > 5:
+            del tokens[position]
+        elif operation < 0.8:
+            tokens.insert(position, replacement)
+        else:
+            tokens.insert(rng.randrange(len(tokens)), tokens.pop(position))
+    return tokens
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def run_accuracy(rng, threshold, sources_count, copies_per_rate):
+    """Hit and false-match rates on the paraphrase corpus"""
+    vocabulary = Vocabulary(rng)
+    index = NearDuplicateIndex(max_entries=sources_count * 2, threshold=threshold)
+
+    sources = []
+    by_fingerprint = {}
+    for i in range(sources_count):
+        topic, tokens = make_post(rng, vocabulary)
+        signature = index.signature(tokens)
+        if signature is None:
+            continue
+        text_fingerprint = fingerprint(f"{i} {' '.join(tokens)}")
+        index.add(signature, rng.random(), text_fingerprint)
+        sources.append((topic, tokens, text_fingerprint))
+        by_fingerprint[f"{text_fingerprint:016x}"] = tokens
+
+    def query(tokens):
+        signature = index.signature(tokens)
+        return index.lookup(signature) if signature is not None else None
+
+    results = {}
+    for rate in EDIT_RATES:
+        hits = similar = wrong = below_threshold = 0
+        for _ in range(copies_per_rate):
+            topic, tokens, text_fingerprint = rng.choice(sources)
+            copy = edit_post(rng, tokens, rate, vocabulary, topic)
+            similar += jaccard(tokens, copy) >= threshold
+            match = query(copy)
+            if match is None:
+                continue
+            if match["matched"] != f"{text_fingerprint:016x}":
+                wrong += 1
+            elif jaccard(tokens, copy) < threshold:
+                below_threshold += 1
+            else:
+                hits += 1
+        results[f"edit_{rate}"] = {
+            "queries": copies_per_rate,
+            "hit_rate": round(hits / copies_per_rate, 4),
+            "true_similar_rate": round(similar / copies_per_rate, 4),
+            "wrong_match_rate": round(wrong / copies_per_rate, 4),
+            "below_threshold_rate": round(below_threshold / copies_per_rate, 4),
+        }
+
+    # Unrelated posts on the same topics must not match anything
+    wrong = 0
+    for _ in range(copies_per_rate):
+        _, tokens = make_post(rng, vocabulary)
+        wrong += query(tokens) is not None
+    results["unrelated"] = {
+        "queries": copies_per_rate,
+        "hit_rate": 0.0,
+        "true_similar_rate": 0.0,
+        "wrong_match_rate": round(wrong / copies_per_rate, 4),
+        "below_threshold_rate": 0.0,
+    }
+    return results
+
+
+def run_scale(rng, threshold, entries, queries):
+    """Insert and lookup latency with the index filled to `entries` items"""
+    vocabulary = Vocabulary(rng)
+    index = NearDuplicateIndex(max_entries=entries, threshold=threshold)
+    np_rng = np.random.RandomState(SEED)
+
+    # Filler entries with random signatures, then real posts on top
+    started = time.perf_counter()
+    for start in range(0, entries, 10000):
+        block = np_rng.randint(0, 2**32, size=(min(10000, entries - start), index.num_perm), dtype=np.uint64)
+        for signature in block:
+            index.add(signature, 0.5, start)
+    fill_seconds = time.perf_counter() - started
+
+    posts = [make_post(rng, vocabulary) for _ in range(queries)]
+    signature_times, add_times, lookup_times = [], [], []
+    for i, (topic, tokens) in enumerate(posts):
+        started = time.perf_counter()
+        signature = index.signature(tokens)
+        signature_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        index.add(signature, 0.5, i)
+        add_times.append(time.perf_counter() - started)
+
+    hits = 0
+    for topic, tokens in posts:
+        copy = edit_post(rng, tokens, 0.1, vocabulary, topic)
+        signature = index.signature(copy)
+        started = time.perf_counter()
+        hits += index.lookup(signature) is not None
+        lookup_times.append(time.perf_counter() - started)
+
+    def summary(timings):
+        timings = sorted(timings)
+        return {
+            "p50_us": round(percentile(timings, 0.50) * 1e6, 2),
+            "p99_us": round(percentile(timings, 0.99) * 1e6, 2),
+        }
+
+    stats = index.stats()
+    return {
+        "entries": stats["entries"],
+        "memory_mb": stats["memory_mb"],
+        "fill_inserts_per_second": round(entries / fill_seconds),
+        "signature": summary(signature_times),
+        "insert": summary(add_times),
+        "lookup": summary(lookup_times),
+        "hit_rate_at_10pct_edits": round(hits / len(posts), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate index")
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--sources', type=int, default=20000, help="Indexed posts for the accuracy run")
+    parser.add_argument('--copies', type=int, default=5000, help="Queries per edit rate")
+    parser.add_argument('--entries', type=int, default=2000000, help="Index size for the latency run")
+    parser.add_argument('--queries', type=int, default=5000, help="Lookups for the latency run")
+    parser.add_argument('--output', default='near_duplicate_results.json')
+    args = parser.parse_args()
+
+    rng = random.Random(SEED)
+    results = {
+        "threshold": args.threshold,
+        "accuracy": run_accuracy(rng, args.threshold, args.sources, args.copies),
+        "scale": run_scale(rng, args.threshold, args.entries, args.queries),
+    }
+    with open(args.output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+        handle.write('\n')
+
+    print(f"{'Queries':<12}{'Hit rate':>10}{'J >= thr':>10}{'Wrong match':>13}{'Below thr':>11}")
+    for name, stats in results["accuracy"].items():
+        print(f"{name:<12}{stats['hit_rate']:>10.2%}{stats['true_similar_rate']:>10.2%}"
+              f"{stats['wrong_match_rate']:>13.3%}{stats['below_threshold_rate']:>11.2%}")
+    scale = results["scale"]
+    print(f"\n{scale['entries']} entries, {scale['memory_mb']} MB, "
+          f"filled at {scale['fill_inserts_per_second']} inserts/s")
+    for name in ("signature", "insert", "lookup"):
+        print(f"{name:<10} p50 {scale[name]['p50_us']:>8} us   p99 {scale[name]['p99_us']:>8} us")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
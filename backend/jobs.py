@@ -0,0 +1,543 @@
+"""
+Asynchronous scoring jobs for submissions too large for one request.
+
+A job is submitted as NDJSON, plain text lines or a JSON ``texts`` array,
+either as the request body or as an uploaded ``file``. The upload is
+streamed into a spool directory, so it is never held in memory, and the
+caller gets a job id straight away. Background worker threads score jobs a
+chunk at a time with the service's batch path (cleaning, cache,
+cascade and batched inference) and append the results to an NDJSON file.
+
+Each job is a directory in AI_JOBS_DIR::
+
+    <job id>/
+        input.ndjson     normalized {"id", "text"} records
+        results.ndjson   one result per input record, in input order
+        state.json       progress, and the input/output offsets of the last
+                         committed chunk
+        lock             flock()ed by the worker running the job
+
+Results are fsynced before the state file is atomically replaced, so after
+a crash a job resumes from its last committed chunk: the results file is
+truncated back to the committed offset and no record is written twice. A
+worker holds the job's flock while it runs the job. The lock goes away with
+the worker's process, so any worker, in this process or another pre-forked
+one, can pick up the job again. Downloads only ever serve committed bytes.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from flask import Response, jsonify, request
+
+TERMINAL_STATES = ('done', 'failed', 'cancelled')
+
+# Partially spooled submissions untouched this long are deleted
+ABANDONED_UPLOAD_SECONDS = 3600
+
+# Fields kept from each verdict unless the submission asks for others
+DEFAULT_FIELDS = ('verdict', 'confidence', 'probability', 'decided_by', 'model_version')
+
+
+class JobInputError(ValueError):
+    """A submission that can't be turned into a job"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_record(line, input_format, text_field, id_field, row):
+    """One {"id", "text"} record from an input line, or None for a blank line"""
+    try:
+        line = line.decode('utf-8') if isinstance(line, bytes) else line
+    except UnicodeDecodeError:
+        raise JobInputError(f"Line {row + 1} is not valid UTF-8")
+    if not line.strip():
+        return None
+    if input_format == 'text':
+        return {"id": row, "text": line.rstrip('\r\n')}
+
+    try:
+        value = json.loads(line)
+    except ValueError:
+        raise JobInputError(f"Line {row + 1} is not valid JSON")
+    if isinstance(value, str):
+        return {"id": row, "text": value}
+    if isinstance(value, dict) and isinstance(value.get(text_field), str):
+        return {"id": value.get(id_field, row), "text": value[text_field]}
+    raise JobInputError(f"Line {row + 1} must be a JSON string or an object with a '{text_field}' string")
+
+
+def write_json(path, value):
+    """Atomically replace a JSON file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(value, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+class JobManager:
+    """Spools submissions to disk and scores them with a pool of worker threads"""
+
+    def __init__(self, directory, score_batch, workers=1, chunk_size=512, max_rows=1000000,
+                 retention_seconds=86400, poll_interval=1.0, chunk_retries=60, registry=None):
+        # score_batch takes a list of texts and returns one result dict per
+        # text, or an {"error": ...} dict if nothing could be scored
+        self.directory = os.path.abspath(directory)
+        self.score_batch = score_batch
+        self.workers = max(1, int(workers))
+        self.chunk_size = max(1, int(chunk_size))
+        self.max_rows = int(max_rows)
+        self.retention = retention_seconds
+        self.poll_interval = poll_interval
+        # Consecutive failed attempts at one chunk before the job fails
+        self.chunk_retries = max(0, int(chunk_retries))
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._running = {}  # job id -> worker thread name, jobs this process is scoring
+
+        if registry is not None:
+            self._rows = registry.counter('ai_job_rows_total', "Rows scored by background jobs", ('outcome',))
+            self._finished = registry.counter('ai_jobs_finished_total', "Background jobs that ended", ('status',))
+        else:
+            self._rows = self._finished = None
+
+    def start(self):
+        """Start the worker threads; unfinished jobs in the spool are picked up again"""
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def job_path(self, job_id):
+        """Directory of a job, or None for unknown / unsafe ids"""
+        if os.path.basename(job_id) != job_id or job_id.startswith('.'):
+            return None
+        path = os.path.join(self.directory, job_id)
+        return path if os.path.exists(os.path.join(path, 'state.json')) else None
+
+    def submit(self, lines, input_format='ndjson', fields=None, text_field='text', id_field='id'):
+        """Spool the input lines as a new queued job and return its state"""
+        now = time.time()
+        # The id is all a caller needs to read or delete the job, so it
+        # carries a full 128 random bits
+        job_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}-{uuid.uuid4().hex}"
+        # Workers only look at complete jobs, so the input is written under a hidden name first
+        partial = os.path.join(self.directory, '.' + job_id)
+        os.makedirs(partial)
+        try:
+            rows = 0
+            with open(os.path.join(partial, 'input.ndjson'), 'wb') as handle:
+                for line in lines:
+                    record = parse_record(line, input_format, text_field, id_field, rows)
+                    if record is None:
+                        continue
+                    rows += 1
+                    if rows > self.max_rows:
+                        raise JobInputError(f"A job can have at most {self.max_rows} texts", 413)
+                    handle.write((json.dumps(record) + '\n').encode('utf-8'))
+                handle.flush()
+                os.fsync(handle.fileno())
+            if not rows:
+                raise JobInputError("The submission has no texts")
+
+            state = {
+                "id": job_id,
+                "status": "queued",
+                "rows_total": rows,
+                "rows_done": 0,
+                "errors": 0,
+                "fields": list(fields) if fields is not None else list(DEFAULT_FIELDS),
+                "input_offset": 0,
+                "output_offset": 0,
+                "attempts": 0,
+                "model_versions": [],
+                "created": now,
+                "started": None,
+                "finished": None,
+                "error": None
+            }
+            write_json(os.path.join(partial, 'state.json'), state)
+            open(os.path.join(partial, 'lock'), 'w').close()
+            os.rename(partial, os.path.join(self.directory, job_id))
+        except BaseException:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+
+        self._wakeup.set()
+        return state
+
+    def state(self, job_id):
+        """The job's state, or None if there is no such job"""
+        path = self.job_path(job_id)
+        if path is None:
+            return None
+        try:
+            return read_json(os.path.join(path, 'state.json'))
+        except (OSError, ValueError):
+            # Deleted in between
+            return None
+
+    def progress(self, job_id):
+        """Public view of a job's state with rate and ETA"""
+        state = self.state(job_id)
+        if state is None:
+            return None
+        progress = {key: state[key] for key in (
+            "id", "status", "rows_total", "rows_done", "errors", "attempts", "model_versions", "error")}
+        progress["percent"] = round(100.0 * state["rows_done"] / state["rows_total"], 2)
+        progress["results_bytes"] = state["output_offset"]
+        for key in ("created", "started", "finished"):
+            progress[key] = (time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(state[key]))
+                             if state[key] is not None else None)
+
+        # The rate covers the current attempt, so it is meaningful right after a resume
+        run_rows = state["rows_done"] - state.get("run_rows_start", 0)
+        run_started = state.get("run_started")
+        elapsed = (state["finished"] or time.time()) - run_started if run_started else 0
+        rate = run_rows / elapsed if elapsed > 0 and run_rows > 0 else None
+        progress["rows_per_second"] = round(rate, 1) if rate else None
+        progress["eta_seconds"] = (round((state["rows_total"] - state["rows_done"]) / rate, 1)
+                                   if rate and state["status"] not in TERMINAL_STATES else None)
+        return progress
+
+    def jobs(self):
+        """Progress of every job in the spool, newest first"""
+        entries = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.startswith('.'):
+                progress = self.progress(name)
+                if progress is not None:
+                    entries.append(progress)
+        return entries
+
+    def results(self, job_id, offset=0, follow=False):
+        """Yield committed NDJSON result bytes from offset; with follow, until the job ends"""
+        path = self.job_path(job_id)
+        results_path = os.path.join(path, 'results.ndjson')
+        while True:
+            state = self.state(job_id)
+            if state is None:
+                return
+            committed = state["output_offset"]
+            if offset < committed:
+                try:
+                    handle = open(results_path, 'rb')
+                except OSError:
+                    # Deleted in between
+                    return
+                with handle:
+                    handle.seek(offset)
+                    while offset < committed:
+                        data = handle.read(min(1 << 16, committed - offset))
+                        if not data:
+                            break
+                        offset += len(data)
+                        yield data
+            if not follow or state["status"] in TERMINAL_STATES:
+                return
+            time.sleep(self.poll_interval)
+
+    def cancel(self, job_id):
+        """Cancel and delete a job; returns 'deleted', 'cancelling' or None if unknown"""
+        path = self.job_path(job_id)
+        if path is None:
+            return None
+        # The worker running the job sees the marker after its current chunk
+        open(os.path.join(path, 'cancel'), 'w').close()
+        lock = self._try_lock(path)
+        if lock is None:
+            return 'cancelling'
+        try:
+            state = read_json(os.path.join(path, 'state.json'))
+            shutil.rmtree(path, ignore_errors=True)
+        finally:
+            lock.close()
+        if self._finished is not None and state["status"] not in TERMINAL_STATES:
+            self._finished.inc('cancelled')
+        return 'deleted'
+
+    def stats(self):
+        """This process's workers and the jobs they are scoring"""
+        with self._lock:
+            running = sorted(self._running)
+        return {
+            "workers": self.workers,
+            "chunk_size": self.chunk_size,
+            "running": running,
+            "directory": self.directory
+        }
+
+    def _try_lock(self, path):
+        """Open and flock the job's lock file without blocking, or None if another worker has it"""
+        try:
+            handle = open(os.path.join(path, 'lock'), 'a')
+        except OSError:
+            return None
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    def _work(self):
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            job_id, path, lock = claimed
+            name = threading.current_thread().name
+            with self._lock:
+                self._running[job_id] = name
+            try:
+                self._run(job_id, path)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self._finish(path, 'failed', error=str(e))
+            finally:
+                with self._lock:
+                    self._running.pop(job_id, None)
+                lock.close()
+
+    def _claim(self):
+        """Lock the oldest unfinished job nobody else is running; also prunes expired jobs"""
+        now = time.time()
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.'):
+                # A submission whose upload stopped without finishing or failing
+                input_path = os.path.join(path, 'input.ndjson')
+                if os.path.exists(input_path) and now - os.path.getmtime(input_path) > ABANDONED_UPLOAD_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                state = read_json(os.path.join(path, 'state.json'))
+            except (OSError, ValueError):
+                continue
+            finished = state["status"] in TERMINAL_STATES
+            if finished and not (self.retention and now - (state["finished"] or now) > self.retention):
+                continue
+
+            lock = self._try_lock(path)
+            if lock is None:
+                continue
+            if finished:
+                shutil.rmtree(path, ignore_errors=True)
+                lock.close()
+                continue
+            return name, path, lock
+        return None
+
+    def _finish(self, path, status, error=None):
+        state_path = os.path.join(path, 'state.json')
+        try:
+            state = read_json(state_path)
+        except (OSError, ValueError):
+            return
+        state["status"] = status
+        state["finished"] = time.time()
+        state["error"] = error
+        write_json(state_path, state)
+        if self._finished is not None:
+            self._finished.inc(status)
+
+    def _run(self, job_id, path):
+        """Score a claimed job from its last committed chunk to the end"""
+        state_path = os.path.join(path, 'state.json')
+        state = read_json(state_path)
+        if state["status"] in TERMINAL_STATES:
+            return
+        state["status"] = "running"
+        state["attempts"] += 1
+        state["started"] = state["started"] or time.time()
+        state["run_started"] = time.time()
+        state["run_rows_start"] = state["rows_done"]
+        write_json(state_path, state)
+        fields = frozenset(state["fields"])
+
+        results_path = os.path.join(path, 'results.ndjson')
+        with open(os.path.join(path, 'input.ndjson'), 'rb') as source, \
+                open(results_path, 'r+b' if os.path.exists(results_path) else 'wb') as output:
+            # Drop anything written after the last committed chunk
+            output.truncate(state["output_offset"])
+            output.seek(state["output_offset"])
+            source.seek(state["input_offset"])
+            failures = 0
+
+            while True:
+                if os.path.exists(os.path.join(path, 'cancel')):
+                    shutil.rmtree(path, ignore_errors=True)
+                    if self._finished is not None:
+                        self._finished.inc('cancelled')
+                    return
+
+                records = []
+                for line in source:
+                    records.append(json.loads(line))
+                    if len(records) == self.chunk_size:
+                        break
+                if not records:
+                    break
+
+                results = self.score_batch([record["text"] for record in records])
+                if isinstance(results, dict):
+                    # Nothing scored (e.g. the model is being loaded); retry the chunk
+                    failures += 1
+                    if failures > self.chunk_retries:
+                        print(f"Job {job_id} failed: {results.get('error')}")
+                        self._finish(path, 'failed', results.get('error'))
+                        return
+                    print(f"Job {job_id} waiting: {results.get('error')}")
+                    source.seek(state["input_offset"])
+                    time.sleep(self.poll_interval)
+                    continue
+                failures = 0
+
+                lines = []
+                errors = 0
+                for record, result in zip(records, results):
+                    if "error" in result:
+                        errors += 1
+                        line = {"id": record["id"], "error": result["error"]}
+                    else:
+                        line = {"id": record["id"]}
+                        line.update((key, value) for key, value in result.items() if key in fields)
+                        version = result.get("model_version")
+                        if version is not None and version not in state["model_versions"]:
+                            state["model_versions"].append(version)
+                    lines.append(json.dumps(line) + '\n')
+                output.write(''.join(lines).encode('utf-8'))
+                output.flush()
+                os.fsync(output.fileno())
+
+                # Commit the chunk: the state only ever points at synced results
+                state["input_offset"] = source.tell()
+                state["output_offset"] = output.tell()
+                state["rows_done"] += len(records)
+                state["errors"] += errors
+                write_json(state_path, state)
+                if self._rows is not None:
+                    self._rows.inc('scored', amount=len(records) - errors)
+                    self._rows.inc('error', amount=errors)
+
+        self._finish(path, 'done')
+
+
+def job_lines():
+    """(lines, input format) of a job submission in the current request"""
+    upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+    if upload is not None:
+        input_format = request.args.get('format') or (
+            'text' if (upload.filename or '').endswith('.txt') else 'ndjson')
+        return upload.stream, input_format
+
+    if request.mimetype == 'application/json':
+        data = request.get_json(silent=True)
+        texts = data.get('texts') if isinstance(data, dict) else None
+        if not isinstance(texts, list):
+            raise JobInputError("JSON submissions need a 'texts' array")
+        return (json.dumps(text) for text in texts), 'texts'
+
+    input_format = request.args.get('format') or ('text' if request.mimetype == 'text/plain' else 'ndjson')
+    return request.stream, input_format
+
+
+def install_jobs(app, manager, parse_fields, admin_authorized=None):
+    """Register the job API routes on a Flask app
+
+    Each job is only reachable through its unguessable id. Listing every
+    job needs ``admin_authorized()`` to return true; without it, the
+    listing route is closed.
+    """
+
+    @app.route('/jobs', methods=['POST'])
+    def submit_job():
+        """Spool a large submission as a background scoring job"""
+        try:
+            fields = parse_fields(request.get_json(silent=True) if request.mimetype == 'application/json' else None)
+            lines, input_format = job_lines()
+            if input_format not in ('ndjson', 'text', 'texts'):
+                raise JobInputError("'format' must be ndjson or text")
+            state = manager.submit(lines, input_format, fields,
+                                   text_field=request.args.get('text_field', 'text'),
+                                   id_field=request.args.get('id_field', 'id'))
+        except JobInputError as e:
+            return jsonify({"error": str(e)}), e.status
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        job_id = state["id"]
+        response = jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status": state["status"],
+            "rows_total": state["rows_total"],
+            "progress_url": f"/jobs/{job_id}",
+            "results_url": f"/jobs/{job_id}/results"
+        })
+        response.status_code = 202
+        response.headers['Location'] = f"/jobs/{job_id}"
+        return response
+
+    @app.route('/jobs', methods=['GET'])
+    def list_jobs():
+        """Progress of every job, for operators"""
+        if admin_authorized is None or not admin_authorized():
+            return jsonify({"error": "Listing jobs needs the admin token"}), 403
+        return jsonify({"jobs": manager.jobs()})
+
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def job_progress(job_id):
+        """Status and progress of one job"""
+        progress = manager.progress(job_id)
+        if progress is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(progress)
+
+    @app.route('/jobs/<job_id>/results', methods=['GET'])
+    def job_results(job_id):
+        """Stream the committed results as NDJSON, optionally following a running job"""
+        state = manager.state(job_id)
+        if state is None:
+            return jsonify({"error": "Job not found"}), 404
+        try:
+            offset = int(request.args.get('offset', '0'))
+        except ValueError:
+            return jsonify({"error": "'offset' must be a byte offset"}), 400
+        if offset < 0 or offset > state["output_offset"]:
+            return jsonify({"error": "'offset' is past the committed results"}), 416
+        follow = request.args.get('follow', '0') in ('1', 'true')
+
+        response = Response(manager.results(job_id, offset, follow), mimetype='application/x-ndjson')
+        response.headers['X-Job-Status'] = state["status"]
+        response.headers['X-Results-Committed'] = str(state["output_offset"])
+        return response
+
+    @app.route('/jobs/<job_id>', methods=['DELETE'])
+    def delete_job(job_id):
+        """Cancel a job and delete its spool"""
+        outcome = manager.cancel(job_id)
+        if outcome is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({"success": True, "status": outcome}), 200 if outcome == 'deleted' else 202
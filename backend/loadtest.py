@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for a running AI service.
+
+Sends /analyze/text requests from several keep-alive connections in
+parallel and reports throughput and latency percentiles. Texts are made
+unique so the verdict cache doesn't hide model cost.
+
+Usage:
+    python loadtest.py [--url http://localhost:5000] [--concurrency 16] [--requests 2000]
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+WORDS = (
+    "government official report claim president election vote scientist study "
+    "research vaccine health economy market police city state country news "
+    "breaking secret alien source media video shocking truth leak confirm deny"
+).split()
+
+
+def make_text(rng):
+    """Random tweet-length text"""
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 40)))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url, concurrency, total_requests, path='/analyze/text'):
+    """Fire total_requests requests over `concurrency` connections"""
+    target = urlparse(url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [total_requests]
+
+    def worker(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        local = []
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+
+            body = json.dumps({"text": make_text(rng)})
+            started = time.perf_counter()
+            try:
+                conn.request('POST', path, body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+                ok = False
+            elapsed = time.perf_counter() - started
+
+            if ok:
+                local.append(elapsed)
+            else:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors[0],
+        "seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AI service")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(json.dumps(run_load(args.url, args.concurrency, args.requests), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Dynamic micro-batching for model inference.
+
+Flask request threads submit one padded sequence each. A background thread
+collects concurrent submissions until either ``max_batch_size`` rows are
+waiting or ``max_wait_ms`` has passed since the first one arrived, runs a
+single batched forward pass and hands every caller its own probability.
+Rows of different lengths (see length buckets in ai_service.py) are grouped
+into one forward pass per length.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Collects single-row predictions into batched forward passes"""
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0):
+        # predict_fn takes an int array of shape (batch, seq_len) and returns
+        # one probability per row
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+        # Tuning statistics
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._wait_total = 0.0
+        self._compute_total = 0.0
+        self._batch_size_counts = [0] * (self.max_batch_size + 1)
+
+    def start(self):
+        """Start the background batching thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Finish queued work and stop the background thread
+
+        Rows submitted after this fail straight away instead of waiting on a
+        thread that will never pick them up.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(_STOP)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, row):
+        """Queue one padded sequence and return a Future for its probability"""
+        future = Future()
+        # Checked under the lock stop() takes, so nothing is queued behind _STOP
+        with self._lock:
+            if not self._stopped:
+                self._queue.put((row, future, time.perf_counter()))
+                return future
+        future.set_exception(RuntimeError("The micro-batcher has been stopped"))
+        return future
+
+    def predict(self, row, timeout=None):
+        """Blocking helper around submit()"""
+        return self.submit(row).result(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+
+        groups = {}
+        for item in batch:
+            groups.setdefault(len(item[0]), []).append(item)
+
+        failed = False
+        for group in groups.values():
+            try:
+                rows = np.stack([row for row, _, _ in group])
+                probabilities = self.predict_fn(rows)
+            except Exception as e:
+                for _, future, _ in group:
+                    future.set_exception(e)
+                failed = True
+            else:
+                for i, (_, future, _) in enumerate(group):
+                    future.set_result(float(probabilities[i]))
+        finished = time.perf_counter()
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._errors += int(failed)
+            self._wait_total += sum(started - queued_at for _, _, queued_at in batch)
+            self._compute_total += finished - started
+            self._batch_size_counts[len(batch)] += 1
+
+    def stats(self):
+        """Queue depth and batch-size statistics for tuning"""
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "items": items,
+                "errors": self._errors,
+                "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+                "avg_queue_wait_ms": round(self._wait_total / items * 1000.0, 3) if items else 0.0,
+                "avg_batch_compute_ms": round(self._compute_total / batches * 1000.0, 3) if batches else 0.0,
+                "batch_size_histogram": {
+                    str(size): count
+                    for size, count in enumerate(self._batch_size_counts)
+                    if count
+                },
+            }
@@ -0,0 +1,149 @@
+"""
+Near-duplicate lookup for lightly edited copies of recently scored texts.
+
+Coordinated misinformation is often posted as many slightly reworded copies
+of one text. The exact-match verdict cache misses those, so this index keeps
+MinHash signatures of the token sets of recently scored texts and finds an
+earlier text whose estimated Jaccard similarity is at least the threshold.
+
+Signatures are ``num_perm`` multiply-shift hash minima, split into ``bands``
+bands for LSH. Each band has a direct-mapped table from the band's hash to
+the most recent entry with that band, so a lookup is a few array reads no
+matter how many texts are indexed. Entries live in a fixed-size ring (the
+oldest is evicted first) and keep the low 16 bits of each minimum, which
+biases the similarity estimate by about 1/65536. Table cells still pointing
+at an evicted slot are harmless: every candidate is verified against the
+signature now stored in that slot.
+"""
+
+import hashlib
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# Fibonacci hashing constant, spreads band keys over the table
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def fingerprint(text):
+    """64-bit hash identifying an indexed text in match references"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class NearDuplicateIndex:
+    """Bounded MinHash/LSH index of recently scored texts and their probabilities"""
+
+    def __init__(self, max_entries=200000, threshold=0.8, num_perm=64, bands=16, min_tokens=8,
+                 ttl_seconds=None, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.max_entries = max(1, int(max_entries))
+        self.threshold = float(threshold)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.min_tokens = min_tokens
+        self.ttl = ttl_seconds
+        # Matching signature positions needed to reach the threshold
+        self._min_matches = int(np.ceil(self.threshold * num_perm - 1e-9))
+
+        # h(x) = (a * x + b) >> 32 with odd a, one function per permutation
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(0, 2**64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2**64, size=num_perm, dtype=np.uint64)
+        # Fold each band into one 64-bit key; the salt keeps equal bands apart
+        self._band_mix = rng.randint(0, 2**64, size=(bands, num_perm // bands), dtype=np.uint64) | np.uint64(1)
+        self._band_salt = rng.randint(0, 2**64, size=bands, dtype=np.uint64)
+        self._band_rows = np.arange(bands)
+
+        # About two table cells per entry and band keeps bucket collisions rare
+        table_bits = max(10, (2 * self.max_entries - 1).bit_length())
+        self._shift = np.uint64(64 - table_bits)
+        self._tables = np.full((bands, 1 << table_bits), -1, dtype=np.int32)
+
+        self._signatures = np.zeros((self.max_entries, num_perm), dtype=np.uint16)
+        self._probabilities = np.zeros(self.max_entries, dtype=np.float32)
+        self._fingerprints = np.zeros(self.max_entries, dtype=np.uint64)
+        self._added_at = np.zeros(self.max_entries, dtype=np.float64)
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self._lookups = 0
+        self._hits = 0
+
+    def signature(self, tokens):
+        """MinHash signature of a token set, or None if it has fewer than min_tokens tokens"""
+        unique = set(tokens)
+        if len(unique) < self.min_tokens:
+            return None
+        hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in unique),
+                             dtype=np.uint64, count=len(unique))
+        return ((hashes[:, np.newaxis] * self._a + self._b) >> np.uint64(32)).min(axis=0)
+
+    def _buckets(self, signature):
+        bands = signature.reshape(self.bands, -1)
+        keys = (bands * self._band_mix).sum(axis=1, dtype=np.uint64) + self._band_salt
+        return ((keys * _GOLDEN) >> self._shift).astype(np.intp)
+
+    def lookup(self, signature, now=None):
+        """Best indexed match at or above the threshold, or None"""
+        buckets = self._buckets(signature)
+        short = signature.astype(np.uint16)
+        now = time.time() if now is None else now
+
+        with self._lock:
+            self._lookups += 1
+            # Bands often agree on the same entry; -1 marks an empty cell
+            slots = set(self._tables[self._band_rows, buckets].tolist())
+            slots.discard(-1)
+            if not slots:
+                return None
+            slots = np.fromiter(slots, dtype=np.intp, count=len(slots))
+            if self.ttl is not None:
+                slots = slots[now - self._added_at[slots] <= self.ttl]
+                if not len(slots):
+                    return None
+
+            matches = np.count_nonzero(self._signatures[slots] == short, axis=1)
+            best = int(np.argmax(matches))
+            if matches[best] < self._min_matches:
+                return None
+            slot = slots[best]
+            self._hits += 1
+            return {
+                "probability": float(self._probabilities[slot]),
+                "similarity": round(int(matches[best]) / self.num_perm, 4),
+                "matched": f"{int(self._fingerprints[slot]):016x}",
+                "age_seconds": round(now - float(self._added_at[slot]), 3)
+            }
+
+    def add(self, signature, probability, text_fingerprint, now=None):
+        """Index a scored text, evicting the oldest entry once full"""
+        buckets = self._buckets(signature)
+        short = signature.astype(np.uint16)
+
+        with self._lock:
+            slot = self._next % self.max_entries
+            self._next += 1
+            self._signatures[slot] = short
+            self._probabilities[slot] = probability
+            self._fingerprints[slot] = text_fingerprint
+            self._added_at[slot] = time.time() if now is None else now
+            self._tables[self._band_rows, buckets] = slot
+
+    def stats(self):
+        """Size and hit statistics"""
+        with self._lock:
+            lookups, hits, added = self._lookups, self._hits, self._next
+        arrays = (self._tables, self._signatures, self._probabilities, self._fingerprints, self._added_at)
+        return {
+            "entries": min(added, self.max_entries),
+            "max_entries": self.max_entries,
+            "evicted": max(0, added - self.max_entries),
+            "threshold": self.threshold,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_mb": round(sum(array.nbytes for array in arrays) / 2**20, 1)
+        }
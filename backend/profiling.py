@@ -0,0 +1,236 @@
+"""
+On-demand request profiling for the AI service.
+
+Nothing here runs unless ai_service.py is started with AI_PROFILING=1; with
+profiling off no hooks or routes are installed at all. When it is on, an
+/analyze* request is profiled if it carries an ``X-Profile`` header (value
+``tf`` also records a TensorFlow profiler trace) and the admin token, or at
+random with probability AI_PROFILE_SAMPLE_RATE.
+
+Each profile is a directory in AI_PROFILE_DIR holding the cProfile stats
+(``profile.pstats``), a text summary, request metadata and the optional TF
+trace. Only the newest AI_PROFILE_MAX_ENTRIES are kept. Profiles are listed
+on ``GET /admin/profiles`` and downloaded from
+``GET /admin/profiles/<id>?format=text|pstats|tf``; both need the admin
+token, and are closed when none is configured.
+
+cProfile only sees the request thread. Rows scored through the
+micro-batcher show up as time waiting on a future, so use the TF trace (or
+AI_BATCHING=0) to see inside the forward pass.
+"""
+
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import random
+import shutil
+import threading
+import time
+import zipfile
+
+from flask import g, jsonify, request, send_file
+
+PROFILE_HEADER = 'X-Profile'
+
+
+class ProfileSession:
+    """One request being profiled"""
+
+    def __init__(self, profiler, entry_id, trigger, tf_trace):
+        self.profiler = profiler
+        self.entry_id = entry_id
+        self.trigger = trigger
+        self.path = os.path.join(profiler.directory, entry_id)
+        self.tf_trace = tf_trace
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+
+        os.makedirs(self.path)
+        if tf_trace:
+            try:
+                import tensorflow as tf
+                tf.profiler.experimental.start(os.path.join(self.path, 'tf_trace'))
+            except Exception:
+                shutil.rmtree(self.path, ignore_errors=True)
+                raise
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self, status=None, save=True):
+        """Stop profiling and write the results to the ring"""
+        self.profile.disable()
+        duration = time.perf_counter() - self.started
+        if self.tf_trace:
+            import tensorflow as tf
+            tf.profiler.experimental.stop()
+
+        try:
+            if not save:
+                shutil.rmtree(self.path, ignore_errors=True)
+                return
+            self.profile.dump_stats(os.path.join(self.path, 'profile.pstats'))
+            summary = io.StringIO()
+            pstats.Stats(self.profile, stream=summary).sort_stats('cumulative').print_stats(40)
+            with open(os.path.join(self.path, 'summary.txt'), 'w') as handle:
+                handle.write(summary.getvalue())
+            with open(os.path.join(self.path, 'meta.json'), 'w') as handle:
+                json.dump({
+                    "id": self.entry_id,
+                    "started": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started_at)),
+                    "duration_ms": round(duration * 1000, 3),
+                    "method": request.method,
+                    "path": request.path,
+                    "status": status,
+                    "content_length": request.content_length,
+                    "trigger": self.trigger,
+                    "tf_trace": self.tf_trace,
+                    "pid": os.getpid()
+                }, handle)
+            self.profiler.prune()
+        finally:
+            self.profiler.release()
+
+
+class RequestProfiler:
+    """Decides which requests to profile and manages the on-disk ring"""
+
+    def __init__(self, directory, max_entries=50, sample_rate=0.0, tf_trace=False):
+        self.directory = os.path.abspath(directory)
+        self.max_entries = max(1, int(max_entries))
+        self.sample_rate = float(sample_rate)
+        self.tf_trace = tf_trace
+        # cProfile and the TF profiler are process-wide, so one request at a time
+        self._busy = threading.Lock()
+        self._sequence = itertools.count()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def start(self, header_value, header_allowed=True):
+        """Start a ProfileSession for the current request, or return None"""
+        if header_value is not None and header_allowed:
+            trigger = 'header'
+            tf_trace = header_value.strip().lower() == 'tf' or self.tf_trace
+        elif self.sample_rate and random.random() < self.sample_rate:
+            trigger = 'sample'
+            tf_trace = self.tf_trace
+        else:
+            return None
+
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            # Ids sort in creation order, which is what prune() relies on
+            now = time.time()
+            entry_id = (f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}{int(now * 1000) % 1000:03d}"
+                        f"-{os.getpid()}-{next(self._sequence) % 10000:04d}")
+            return ProfileSession(self, entry_id, trigger, tf_trace)
+        except Exception as e:
+            print(f"Could not start profiling: {e}")
+            self._busy.release()
+            return None
+
+    def release(self):
+        self._busy.release()
+
+    def entries(self):
+        """Metadata of the stored profiles, newest first"""
+        entries = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            try:
+                with open(os.path.join(self.directory, name, 'meta.json')) as handle:
+                    entries.append(json.load(handle))
+            except (OSError, ValueError):
+                # Still being written, or not a profile
+                continue
+        return entries
+
+    def prune(self):
+        """Delete the oldest profiles beyond max_entries"""
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if os.path.exists(os.path.join(self.directory, name, 'meta.json'))
+        )
+        for name in names[:-self.max_entries]:
+            # Other worker processes may be pruning the same directory
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def entry_path(self, entry_id):
+        """Directory of a stored profile, or None for unknown / unsafe ids"""
+        if os.path.basename(entry_id) != entry_id or entry_id.startswith('.'):
+            return None
+        path = os.path.join(self.directory, entry_id)
+        return path if os.path.exists(os.path.join(path, 'meta.json')) else None
+
+
+def install_profiling(app, profiler, admin_authorized=None):
+    """Register the profiling hooks and admin routes on a Flask app
+
+    ``admin_authorized()`` decides whether a request carries the admin
+    token. Without it, the X-Profile header is ignored and the routes are
+    closed; sampling still works.
+    """
+
+    def authorized():
+        return admin_authorized is not None and admin_authorized()
+
+    @app.before_request
+    def start_profile():
+        if request.path.startswith('/analyze'):
+            header_value = request.headers.get(PROFILE_HEADER)
+            session = profiler.start(header_value, header_allowed=header_value is not None and authorized())
+            if session is not None:
+                g.profile_session = session
+
+    @app.after_request
+    def save_profile(response):
+        session = g.pop('profile_session', None)
+        if session is not None:
+            session.stop(response.status_code)
+            response.headers['X-Profile-Id'] = session.entry_id
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # Only reached with a session when after_request didn't run
+        session = g.pop('profile_session', None)
+        if session is not None:
+            session.stop(save=False)
+
+    @app.route('/admin/profiles', methods=['GET'])
+    def list_profiles():
+        """List stored request profiles"""
+        if not authorized():
+            return jsonify({"error": "Profiles need the admin token"}), 403
+        return jsonify({"profiles": profiler.entries()})
+
+    @app.route('/admin/profiles/<entry_id>', methods=['GET'])
+    def download_profile(entry_id):
+        """Download one profile as a text summary, pstats file or TF trace zip"""
+        if not authorized():
+            return jsonify({"error": "Profiles need the admin token"}), 403
+        path = profiler.entry_path(entry_id)
+        if path is None:
+            return jsonify({"error": "Profile not found"}), 404
+
+        output_format = request.args.get('format', 'text')
+        if output_format == 'text':
+            return send_file(os.path.join(path, 'summary.txt'), mimetype='text/plain')
+        if output_format == 'pstats':
+            return send_file(os.path.join(path, 'profile.pstats'), as_attachment=True,
+                             download_name=f"{entry_id}.pstats")
+        if output_format == 'tf':
+            trace_dir = os.path.join(path, 'tf_trace')
+            if not os.path.isdir(trace_dir):
+                return jsonify({"error": "This profile has no TF trace"}), 404
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                for root, _, files in os.walk(trace_dir):
+                    for name in files:
+                        full_path = os.path.join(root, name)
+                        zip_file.write(full_path, os.path.relpath(full_path, trace_dir))
+            archive.seek(0)
+            return send_file(archive, mimetype='application/zip', as_attachment=True,
+                             download_name=f"{entry_id}-tf_trace.zip")
+        return jsonify({"error": "'format' must be one of text, pstats, tf"}), 400
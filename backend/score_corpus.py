@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Offline bulk scoring of large CSV / JSONL corpora.
+
+The input is streamed in chunks, so the corpus is never held in memory.
+Worker processes clean and encode each chunk with the service's
+TextEncoder while the parent runs batched inference on the previous ones,
+and results are appended to JSONL or Parquet part files as they finish.
+After every chunk the progress is checkpointed; rerunning the same
+command resumes where an interrupted run stopped.
+
+Usage:
+    python score_corpus.py archive.csv scores.jsonl [--text-column text] [--id-column id]
+    python score_corpus.py archive.jsonl scores_parquet/ --format parquet
+
+The model, vocabulary and inference backend are configured with the same
+AI_* variables as ai_service.py (see env.example).
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+import ai_service
+
+# Fields copied from the service's verdict into each output record
+OUTPUT_FIELDS = ('verdict', 'confidence', 'probability')
+
+
+def read_records(path, text_column, id_column=None, skip=0):
+    """Yield (row, id, text) from a CSV or JSONL file, skipping the first rows"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        if path.endswith(('.jsonl', '.ndjson', '.json')):
+            records = (json.loads(line) for line in handle if line.strip())
+        else:
+            csv.field_size_limit(sys.maxsize)
+            records = csv.DictReader(handle)
+
+        for row, record in enumerate(records):
+            if row < skip:
+                continue
+            yield row, record.get(id_column) if id_column else row, record.get(text_column)
+
+
+def chunked(records, size):
+    """Group an iterator into lists of at most size items"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def init_worker():
+    """Build the text encoder once per worker process"""
+    ai_service.load_encoder()
+
+
+def encode_chunk(texts):
+    """Clean and encode one chunk of texts (runs in a worker process)"""
+    return ai_service.encoder.encode_batch(texts)
+
+
+def score_chunk(chunk, cleaned_texts, padded_seqs, inference_batch_size):
+    """Run batched inference for an encoded chunk and build output records"""
+    valid = [i for i, cleaned_text in enumerate(cleaned_texts) if cleaned_text.strip()]
+    probabilities = np.empty(len(valid), dtype=np.float32)
+    for start in range(0, len(valid), inference_batch_size):
+        rows = padded_seqs[valid[start:start + inference_batch_size]]
+        probabilities[start:start + len(rows)] = ai_service.active_bundle.score_by_bucket(rows)
+
+    scored = dict(zip(valid, probabilities))
+    records = []
+    for i, (row, record_id, _) in enumerate(chunk):
+        record = {"row": row, "id": record_id}
+        if i in scored:
+            result = ai_service.build_result(float(scored[i]), cleaned_texts[i])
+            record.update((field, result[field]) for field in OUTPUT_FIELDS)
+        else:
+            record["error"] = "No valid text content found"
+        records.append(record)
+    return records
+
+
+class JsonlWriter:
+    """Appends records to a JSONL file, truncated to the checkpointed offset"""
+
+    def __init__(self, path, checkpoint):
+        self.path = path
+        self._handle = open(path, 'r+b' if os.path.exists(path) else 'wb')
+        self._handle.truncate(checkpoint.get('output_offset', 0))
+        self._handle.seek(0, os.SEEK_END)
+
+    def write(self, records):
+        self._handle.write(''.join(json.dumps(record) + '\n' for record in records).encode('utf-8'))
+
+    def commit(self, checkpoint):
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        checkpoint['output_offset'] = self._handle.tell()
+
+    def close(self):
+        self._handle.close()
+
+
+class ParquetWriter:
+    """Writes each chunk as a Parquet part file in an output directory"""
+
+    def __init__(self, path, checkpoint):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+
+        self.path = path
+        self.part = checkpoint.get('output_parts', 0)
+        self.schema = None
+        os.makedirs(path, exist_ok=True)
+        # Parts written after the last checkpoint are rewritten
+        for name in os.listdir(path):
+            if name.startswith('part-') and int(name[5:10]) >= self.part:
+                os.remove(os.path.join(path, name))
+
+    def write(self, records):
+        # Fixed schema, so chunks where every row failed (or none did) still
+        # have all the columns
+        if self.schema is None:
+            id_type = self._pa.int64() if isinstance(records[0]["id"], int) else self._pa.string()
+            self.schema = self._pa.schema([
+                ("row", self._pa.int64()),
+                ("id", id_type),
+                ("verdict", self._pa.string()),
+                ("confidence", self._pa.float64()),
+                ("probability", self._pa.float64()),
+                ("error", self._pa.string()),
+            ])
+        if self.schema.field("id").type == self._pa.string():
+            for record in records:
+                if record["id"] is not None:
+                    record["id"] = str(record["id"])
+        table = self._pa.Table.from_pylist(records, schema=self.schema)
+        self._pq.write_table(table, os.path.join(self.path, f"part-{self.part:05d}.parquet"))
+        self.part += 1
+
+    def commit(self, checkpoint):
+        checkpoint['output_parts'] = self.part
+
+    def close(self):
+        pass
+
+
+WRITERS = {'jsonl': JsonlWriter, 'parquet': ParquetWriter}
+
+
+def load_checkpoint(path, input_path):
+    """Load the checkpoint for input_path, or start a fresh one"""
+    if os.path.exists(path):
+        with open(path) as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get('input') == os.path.abspath(input_path):
+            return checkpoint
+        print(f"Ignoring checkpoint {path}: it belongs to another input")
+    return {"input": os.path.abspath(input_path), "rows_done": 0}
+
+
+def save_checkpoint(path, checkpoint):
+    """Atomically replace the checkpoint file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(checkpoint, handle)
+    os.replace(tmp_path, path)
+
+
+def score_corpus(input_path, output_path, output_format='jsonl', text_column='text', id_column=None,
+                 chunk_size=2048, inference_batch_size=512, workers=None, checkpoint_path=None,
+                 restart=False):
+    """Score every record of input_path into output_path, resuming from the checkpoint"""
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    checkpoint_path = checkpoint_path or output_path.rstrip('/') + '.checkpoint.json'
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = load_checkpoint(checkpoint_path, input_path)
+    if checkpoint['rows_done']:
+        print(f"Resuming after {checkpoint['rows_done']} rows")
+
+    # Fork the encoding workers before TensorFlow is imported: the TF runtime
+    # is not fork-safe
+    pool = multiprocessing.Pool(workers, initializer=init_worker)
+
+    # Offline scoring has no repeats to cache and no concurrent callers to batch
+    ai_service.CACHE_ENABLED = False
+    ai_service.BATCHING_ENABLED = False
+    if not ai_service.load_model():
+        pool.terminate()
+        raise SystemExit("Could not load the model")
+
+    writer = WRITERS[output_format](output_path, checkpoint)
+    records = read_records(input_path, text_column, id_column, skip=checkpoint['rows_done'])
+    chunks = chunked(records, chunk_size)
+
+    rows = 0
+    started = time.perf_counter()
+    pending = deque()
+    try:
+        # Keep a bounded number of chunks in flight so memory stays flat
+        for chunk in chunks:
+            texts = [text for _, _, text in chunk]
+            pending.append((chunk, pool.apply_async(encode_chunk, (texts,))))
+            if len(pending) < workers * 2:
+                continue
+            rows += write_chunk(*pending.popleft(), writer, checkpoint, checkpoint_path,
+                                inference_batch_size)
+            report(rows, started)
+        while pending:
+            rows += write_chunk(*pending.popleft(), writer, checkpoint, checkpoint_path,
+                                inference_batch_size)
+            report(rows, started)
+    finally:
+        pool.terminate()
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "rows": rows,
+        "rows_total": checkpoint['rows_done'],
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+        "workers": workers,
+    }
+    print(json.dumps(summary))
+    return summary
+
+
+def write_chunk(chunk, encoded, writer, checkpoint, checkpoint_path, inference_batch_size):
+    """Score, write and checkpoint one chunk once its encoding is done"""
+    cleaned_texts, padded_seqs = encoded.get()
+    writer.write(score_chunk(chunk, cleaned_texts, padded_seqs, inference_batch_size))
+    writer.commit(checkpoint)
+    checkpoint['rows_done'] = chunk[-1][0] + 1
+    save_checkpoint(checkpoint_path, checkpoint)
+    return len(chunk)
+
+
+def report(rows, started):
+    elapsed = time.perf_counter() - started
+    print(f"{rows} rows scored, {rows / elapsed:.1f} rows/s", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV or JSONL corpus offline")
+    parser.add_argument('input', help="CSV or JSONL (.jsonl / .ndjson) file")
+    parser.add_argument('output', help="JSONL file, or a directory for --format parquet")
+    parser.add_argument('--format', choices=sorted(WRITERS), default=None,
+                        help="Output format (default: from the output extension)")
+    parser.add_argument('--text-column', default='text')
+    parser.add_argument('--id-column', default=None)
+    parser.add_argument('--chunk-size', type=int, default=2048, help="Rows per encoding task")
+    parser.add_argument('--inference-batch-size', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=None, help="Encoding processes (default: cores - 1)")
+    parser.add_argument('--checkpoint', default=None, help="Default: <output>.checkpoint.json")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    output_format = args.format or ('parquet' if args.output.endswith(('.parquet', '/')) else 'jsonl')
+    score_corpus(
+        args.input,
+        args.output,
+        output_format=output_format,
+        text_column=args.text_column,
+        id_column=args.id_column,
+        chunk_size=args.chunk_size,
+        inference_batch_size=args.inference_batch_size,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the AI service.
+
+The parent process imports TensorFlow, loads NLTK data and builds the text
+encoder from the trimmed vocabulary, opens the listening socket and then
+pre-forks AI_WORKERS worker processes. Those pages are shared copy-on-write
+until a worker writes to them. TensorFlow's runtime is not fork-safe, so
+each worker sets its own thread pools, loads the model and warms up before
+it starts accepting connections on the shared socket. Dead workers are restarted.
+SIGHUP is forwarded to every worker, which hot-swaps in the current model
+version without dropping requests.
+
+Configuration (environment):
+    AI_SERVICE_HOST       bind address (default 0.0.0.0)
+    AI_SERVICE_PORT       port (default 5000)
+    AI_WORKERS            worker processes (default: one per AI_INTRA_OP_THREADS cores)
+    AI_INTRA_OP_THREADS   TF intra-op threads per worker (default: cores / workers)
+    AI_INTER_OP_THREADS   TF inter-op threads per worker (default 1)
+    AI_CPU_AFFINITY       '' (no pinning), 'auto' (split the available cores
+                          evenly) or explicit sets such as '0-3;4-7'
+
+Linux/macOS only (uses fork). On Windows run ai_service.py directly.
+"""
+
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+import ai_service
+
+HOST = os.environ.get('AI_SERVICE_HOST', '0.0.0.0')
+PORT = int(os.environ.get('AI_SERVICE_PORT', '5000'))
+CPU_AFFINITY = os.environ.get('AI_CPU_AFFINITY', '')
+
+# Don't restart a worker more often than this (seconds)
+RESTART_BACKOFF = 1.0
+
+
+def available_cpus():
+    """CPUs this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_settings():
+    """Work out worker count and per-worker TF thread counts"""
+    cores = len(available_cpus())
+    workers = int(os.environ.get('AI_WORKERS') or 0)
+    intra = int(os.environ.get('AI_INTRA_OP_THREADS') or 0)
+    inter = int(os.environ.get('AI_INTER_OP_THREADS') or 1)
+
+    if not workers:
+        workers = max(1, cores // intra) if intra else cores
+    if not intra:
+        intra = max(1, cores // workers)
+    return workers, intra, inter
+
+
+def parse_cpu_list(spec):
+    """Parse '0-3,6' into [0, 1, 2, 3, 6]"""
+    cpus = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def cpu_sets(workers):
+    """CPU set for each worker slot, or None for no pinning"""
+    if not CPU_AFFINITY or not hasattr(os, 'sched_setaffinity'):
+        return [None] * workers
+
+    if CPU_AFFINITY == 'auto':
+        cpus = available_cpus()
+        per_worker = max(1, len(cpus) // workers)
+        return [
+            cpus[(i * per_worker) % len(cpus):(i * per_worker) % len(cpus) + per_worker]
+            for i in range(workers)
+        ]
+
+    sets = [parse_cpu_list(spec) for spec in CPU_AFFINITY.split(';') if spec.strip()]
+    return [sets[i % len(sets)] for i in range(workers)]
+
+
+def run_worker(slot, listen_fd, cpus, intra, inter):
+    """Worker process body: pin, configure TF, load, warm up, serve"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # A worker that is still starting up loads the current version anyway
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    ai_service.configure_tensorflow_threads(intra, inter)
+
+    if not ai_service.load_model():
+        os._exit(1)
+    ai_service.warm_up()
+
+    # SIGHUP hot-swaps the model (see /admin/reload in ai_service.py)
+    signal.signal(signal.SIGHUP, lambda signum, frame: ai_service.start_reload())
+
+    server = make_server(HOST, PORT, ai_service.app, threaded=True, fd=listen_fd)
+    print(f"[worker {slot}] pid {os.getpid()} serving (cpus={cpus or 'any'}, intra={intra}, inter={inter})")
+    server.serve_forever()
+    os._exit(0)
+
+
+def main():
+    workers, intra, inter = worker_settings()
+    cpus_per_slot = cpu_sets(workers)
+
+    # Shared read-only artifacts, loaded once before forking
+    started = time.perf_counter()
+    ai_service.import_tensorflow()
+    ai_service.load_encoder()
+    print(f"Artifacts loaded in {time.perf_counter() - started:.2f}s")
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((HOST, PORT))
+    listener.listen(1024)
+    listener.set_inheritable(True)
+
+    children = {}  # pid -> (slot, started_at)
+    stopping = False
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(slot, listener.fileno(), cpus_per_slot[slot], intra, inter)
+            finally:
+                os._exit(1)
+        children[pid] = (slot, time.monotonic())
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reload(signum, frame):
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGHUP, reload)
+
+    print(f"Starting {workers} workers on {HOST}:{PORT}")
+    for slot in range(workers):
+        spawn(slot)
+
+    # Supervise: restart workers that die unexpectedly
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        slot, started_at = children.pop(pid, (None, 0))
+        if slot is None or stopping:
+            continue
+
+        print(f"[worker {slot}] pid {pid} exited with status {status}, restarting")
+        delay = RESTART_BACKOFF - (time.monotonic() - started_at)
+        if delay > 0:
+            time.sleep(delay)
+        spawn(slot)
+
+    listener.close()
+    print("AI Service stopped")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
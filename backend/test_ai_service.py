@@ -5,6 +5,9 @@ Test script for the AI service
 
 import requests
 import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 def test_ai_service():
     """Test the AI service endpoints"""
@@ -94,8 +97,225 @@ def test_ai_service():
     except Exception as e:
         print(f"❌ Fake news detection error: {e}")
     
+    # Test 5: Batch analysis
+    print("\n5. Testing batch analysis...")
+    
+    try:
+        response = requests.post(
+            f"{base_url}/analyze/batch",
+            json={"texts": [test_text, fake_text, "123 !!!"], "ids": ["a", "b", "c"]},
+            headers={"Content-Type": "application/json"}
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            print("✅ Batch analysis passed")
+            for item in result.get('results', []):
+                print(f"   {item.get('id')}: {item.get('verdict', item.get('error'))}")
+        else:
+            print(f"❌ Batch analysis failed: {response.status_code}")
+            print(f"   Error: {response.text}")
+    except Exception as e:
+        print(f"❌ Batch analysis error: {e}")
+    
+    # Test 6: Metrics
+    print("\n6. Testing metrics endpoint...")
+    
+    try:
+        response = requests.get(f"{base_url}/metrics")
+        
+        if response.status_code == 200 and "ai_stage_duration_seconds" in response.text:
+            print("✅ Metrics endpoint passed")
+            for line in response.text.splitlines():
+                if line.startswith(("ai_requests_total", "ai_stage_duration_seconds_count")):
+                    print(f"   {line}")
+        else:
+            print(f"❌ Metrics endpoint failed: {response.status_code}")
+    except Exception as e:
+        print(f"❌ Metrics endpoint error: {e}")
+    
+    # Test 7: Field selection
+    print("\n7. Testing field selection...")
+    
+    try:
+        response = requests.post(
+            f"{base_url}/analyze/batch",
+            json={"texts": [test_text, fake_text], "fields": ["verdict", "probability"]},
+            headers={"Content-Type": "application/json"}
+        )
+        
+        items = response.json().get('results', []) if response.status_code == 200 else []
+        if items and all(sorted(item) == ["probability", "verdict"] for item in items):
+            print("✅ Field selection passed")
+            print(f"   {len(response.content)} bytes for {len(items)} results")
+        else:
+            print(f"❌ Field selection failed: {response.status_code}")
+            print(f"   Response: {response.text[:200]}")
+    except Exception as e:
+        print(f"❌ Field selection error: {e}")
+    
+    # Test 8: Occlusion attribution
+    print("\n8. Testing explain mode...")
+    
+    try:
+        response = requests.post(
+            f"{base_url}/analyze/text",
+            json={"text": fake_text, "explain": True},
+            headers={"Content-Type": "application/json"}
+        )
+        
+        attribution = response.json().get('attribution') if response.status_code == 200 else None
+        if attribution and attribution.get('top_words'):
+            print("✅ Explain mode passed")
+            print(f"   Top words: {[word['text'] for word in attribution['top_words'][:3]]}")
+            print(f"   Overhead: {attribution['overhead_ms']} ms for {attribution['spans_scored']} spans")
+        else:
+            print(f"❌ Explain mode failed: {response.status_code}")
+            print(f"   Response: {response.text[:200]}")
+    except Exception as e:
+        print(f"❌ Explain mode error: {e}")
+    
     print("\n" + "=" * 50)
     print("Test completed!")
 
+def test_url_ingestion():
+    """Test the async URL ingestion layer against a local stub HTTP server"""
+    from url_ingest import UrlIngestor
+    
+    print("\nTesting URL ingestion against a stub server...")
+    print("=" * 50)
+    
+    # Canned tweet payloads; status 999 is a slow upstream and status 777
+    # arrives in several pieces with pauses in between
+    tweets = {
+        str(1000 + i): {
+            "text": f"Scientists publish study number {i} about dinosaur fossils in Argentina.",
+            "user": {"screen_name": f"user{i}"},
+            "created_at": "2024-01-01T00:00:00Z"
+        }
+        for i in range(20)
+    }
+    tweets["777"] = {
+        "text": "Officials confirm the bridge reopened after repairs. " * 60,
+        "user": {"screen_name": "slowsender"},
+        "created_at": "2024-01-01T00:00:00Z"
+    }
+    hits = []
+    
+    class StubTweetHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def do_GET(self):
+            status_id = self.path.rsplit('/', 1)[-1]
+            hits.append(status_id)
+            if status_id == '999':
+                time.sleep(2)
+            payload = tweets.get(status_id)
+            body = json.dumps(payload or {"error": "not found"}).encode()
+            self.send_response(200 if payload else 404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if status_id == '777':
+                for start in range(0, len(body), 1000):
+                    self.wfile.write(body[start:start + 1000])
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            else:
+                self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    # The default listen backlog of 5 can drop some of the concurrent
+    # connections below, which then only connect after a SYN retransmit
+    class StubServer(ThreadingHTTPServer):
+        request_queue_size = 64
+    
+    server = StubServer(("127.0.0.1", 0), StubTweetHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ingestor = UrlIngestor(
+        f"http://127.0.0.1:{server.server_port}/tweet/{{status_id}}",
+        timeout=1.0
+    ).start()
+    
+    def check(name, passed, detail=""):
+        print(f"{'✅' if passed else '❌'} {name}" + (f" ({detail})" if detail else ""))
+    
+    try:
+        result = ingestor.fetch("https://twitter.com/user0/status/1000")
+        check("Single fetch", result.get("author") == "user0", result.get("content", result.get("error")))
+        
+        before = len(hits)
+        result = ingestor.fetch("https://www.x.com/someone/status/1000?s=20")
+        check("Normalized URL served from cache", len(hits) == before and "content" in result)
+        
+        started = time.perf_counter()
+        result = ingestor.fetch("https://twitter.com/slow/status/999")
+        elapsed = time.perf_counter() - started
+        check("Slow upstream times out", "error" in result and elapsed < 1.5, f"{elapsed:.2f}s")
+        
+        result = ingestor.fetch("https://twitter.com/slowsender/status/777")
+        check("Payload sent in pieces read in full", result.get("author") == "slowsender",
+              result.get("error", f"{len(result.get('content', ''))} chars"))
+        
+        check("Non-tweet URL rejected", "error" in ingestor.fetch("https://example.com/status/1"))
+        check("Missing tweet reported", "error" in ingestor.fetch("https://twitter.com/u/status/4040"))
+        
+        urls = [f"https://twitter.com/user{i}/status/{1000 + i}" for i in range(1, 20)]
+        started = time.perf_counter()
+        results = ingestor.fetch_many(urls)
+        elapsed = time.perf_counter() - started
+        in_order = all(r.get("author") == f"user{i}" for i, r in enumerate(results, start=1))
+        check("Concurrent fetch of 19 URLs", in_order, f"{elapsed * 1000:.0f} ms")
+        print(f"   Stats: {ingestor.stats()}")
+    finally:
+        ingestor.stop()
+        server.shutdown()
+
+def test_admission():
+    """Test that bad deadlines can't leak admission slots"""
+    from flask import Flask, jsonify
+    from admission import AdmissionController, Lane, install_admission
+    
+    print("\nTesting admission control...")
+    print("=" * 50)
+    
+    def check(name, passed, detail=""):
+        print(f"{'✅' if passed else '❌'} {name}" + (f" ({detail})" if detail else ""))
+    
+    controller = AdmissionController([Lane('interactive', 1, 4), Lane('bulk', 1, 4)], concurrency=1)
+    app = Flask(__name__)
+    install_admission(app, controller, ('/analyze/batch',))
+    
+    @app.route('/analyze/text', methods=['POST'])
+    def analyze_text():
+        return jsonify({"success": True})
+    
+    client = app.test_client()
+    for value in ('inf', '1e300', 'nan', '-5', 'soon'):
+        response = client.post('/analyze/text', json={}, headers={'X-Deadline-Ms': value})
+        check(f"X-Deadline-Ms: {value} rejected", response.status_code == 400, str(response.status_code))
+    
+    response = client.post('/analyze/text', json={})
+    check("Normal request still admitted", response.status_code == 200, str(response.status_code))
+    
+    # A wait that fails while queued must not leave its waiter behind to
+    # be granted a slot nobody releases
+    held = controller.acquire('interactive')
+    try:
+        controller.acquire('interactive', float('inf'))
+    except (OverflowError, ValueError):
+        pass
+    controller.release(held)
+    stats = controller.stats()
+    check("No slot leaked by a failed wait", stats["active"] == 0 and stats["lanes"]["interactive"]["queued"] == 0,
+          f"active {stats['active']}")
+    # With a leaked slot this would wait out its deadline and get a 503
+    response = client.post('/analyze/text', json={}, headers={'X-Deadline-Ms': '1000'})
+    check("Request admitted after the failed wait", response.status_code == 200, str(response.status_code))
+
 if __name__ == "__main__":
-    test_ai_service() 
\ No newline at end of file
+    test_ai_service()
+    test_url_ingestion()
+    test_admission()
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+Fused raw-text to token-id encoder.
+
+Produces exactly the ids of ``clean_text`` followed by the Keras tokenizer's
+``texts_to_sequences`` and ``pad_sequences(maxlen=max_len)``, but in a single
+pass: every surface word is looked up once in a table that maps it straight
+to its lemma and token ids, and the ids are written into a preallocated
+int32 row.
+
+The vocabulary can be loaded from a trimmed artifact (``tokenizer_vocab.npy``
++ ``tokenizer_vocab.json``) instead of unpickling the full Keras Tokenizer.
+Convert an existing pickle with::
+
+    python text_encoder.py tokenizer.pickle tokenizer_vocab.npy
+"""
+
+import json
+import os
+import pickle
+import re
+import sys
+
+import numpy as np
+
+# Keras Tokenizer defaults
+DEFAULT_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+# clean_text() calls re.sub(pattern, '', text, re.I|re.A). The fourth
+# positional argument of re.sub is *count*, so only the first 258 non-letter
+# characters are removed. The model was trained on that output, so the
+# encoder reproduces it instead of fixing it.
+_NON_LETTERS = re.compile(r'[^a-zA-Z\s]')
+_LEGACY_SUB_COUNT = int(re.I | re.A)
+
+# Marker for stopwords in the surface table
+_STOPWORD = None
+
+# Upper bound on memoized surface forms that are not in the vocabulary
+MAX_MEMO_ENTRIES = 200000
+
+
+def vocabulary_meta_path(path):
+    """Path of the JSON metadata that accompanies a vocabulary .npy file"""
+    return os.path.splitext(path)[0] + '.json'
+
+
+def save_vocabulary(tokenizer, path):
+    """Write the tokenizer's num_words vocabulary as a compact .npy
+
+    Row i holds the UTF-8 bytes of the word with token id i + 1. Words past
+    num_words are dropped: texts_to_sequences never emits their ids, and
+    dropping them leaves the encoded output unchanged.
+    """
+    limit = tokenizer.num_words or len(tokenizer.word_index) + 1
+    words = sorted((index, word) for word, index in tokenizer.word_index.items() if index < limit)
+    np.save(path, np.array([word.encode('utf-8') for _, word in words]))
+
+    meta = {
+        "num_words": tokenizer.num_words,
+        "vocab_size": len(words),
+        "oov_token": tokenizer.oov_token,
+        "filters": tokenizer.filters,
+        "lower": tokenizer.lower,
+        "split": tokenizer.split,
+        "char_level": tokenizer.char_level,
+    }
+    with open(vocabulary_meta_path(path), 'w') as handle:
+        json.dump(meta, handle)
+
+
+def load_vocabulary(path):
+    """Load a vocabulary written by save_vocabulary()
+
+    The encoder turns it into per-word hash tables anyway, so the array is
+    read in full rather than memory-mapped. Under serve.py those tables are
+    built once in the parent and inherited by the workers.
+    """
+    words = np.load(path)
+    with open(vocabulary_meta_path(path)) as handle:
+        meta = json.load(handle)
+    word_index = {word.decode('utf-8'): i + 1 for i, word in enumerate(words.tolist())}
+    return words, word_index, meta
+
+
+class TextEncoder:
+    """Raw text -> (cleaned text, padded int32 ids) in one pass"""
+
+    def __init__(self, word_index, num_words, max_len, stop_words, lemmatize,
+                 oov_token=None, filters=DEFAULT_FILTERS, lower=True):
+        self.word_index = word_index
+        self.num_words = num_words
+        self.max_len = max_len
+        self.stop_words = stop_words
+        self.lemmatize = lemmatize
+        self.oov_token = oov_token
+        self.oov_index = word_index.get(oov_token) if oov_token is not None else None
+        self.lower = lower
+        self._translate = str.maketrans({c: ' ' for c in filters})
+
+        # surface word -> (lemma, token ids), or _STOPWORD
+        self._surface = {word: _STOPWORD for word in stop_words}
+        self._memo_size = 0
+        # token id -> vocabulary word, built on first use by words()
+        self._index_word = None
+
+        # Precompute the table for every word the model can actually see
+        limit = num_words if num_words else len(word_index) + 1
+        for word, index in word_index.items():
+            if index < limit and word not in self._surface:
+                self._surface[word] = self._lookup(word)
+
+    @classmethod
+    def from_vocabulary(cls, path, max_len, stop_words, lemmatize):
+        """Build an encoder from a vocabulary written by save_vocabulary()"""
+        _, word_index, meta = load_vocabulary(path)
+        if meta["char_level"] or meta["split"] != ' ':
+            raise ValueError("Only word-level tokenizers splitting on ' ' are supported")
+        return cls(
+            word_index,
+            meta["num_words"],
+            max_len,
+            stop_words,
+            lemmatize,
+            oov_token=meta["oov_token"],
+            filters=meta["filters"],
+            lower=meta["lower"],
+        )
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, max_len, stop_words, lemmatize):
+        """Build an encoder that matches a fitted Keras Tokenizer"""
+        if tokenizer.char_level or tokenizer.split != ' ':
+            raise ValueError("Only word-level tokenizers splitting on ' ' are supported")
+        return cls(
+            tokenizer.word_index,
+            tokenizer.num_words,
+            max_len,
+            stop_words,
+            lemmatize,
+            oov_token=tokenizer.oov_token,
+            filters=tokenizer.filters,
+            lower=tokenizer.lower,
+        )
+
+    def _token_ids(self, lemma):
+        """Ids that texts_to_sequences produces for one lemma"""
+        if self.lower:
+            lemma = lemma.lower()
+        ids = []
+        for word in lemma.translate(self._translate).split(' '):
+            if not word:
+                continue
+            index = self.word_index.get(word)
+            if index is not None:
+                if self.num_words and index >= self.num_words:
+                    if self.oov_index is not None:
+                        ids.append(self.oov_index)
+                else:
+                    ids.append(index)
+            elif self.oov_token is not None:
+                ids.append(self.oov_index)
+        return tuple(ids)
+
+    def _lookup(self, word):
+        lemma = self.lemmatize(word)
+        return lemma, self._token_ids(lemma)
+
+    def tokenize(self, text):
+        """Return the cleaned text and the full (untruncated) list of token ids"""
+        if not isinstance(text, str):
+            return "", []
+
+        text = _NON_LETTERS.sub('', text.lower(), _LEGACY_SUB_COUNT)
+
+        surface = self._surface
+        lemmas = []
+        ids = []
+        for word in text.split():
+            entry = surface.get(word, False)
+            if entry is False:
+                entry = self._lookup(word)
+                if self._memo_size < MAX_MEMO_ENTRIES:
+                    surface[word] = entry
+                    self._memo_size += 1
+            if entry is _STOPWORD:
+                continue
+            lemmas.append(entry[0])
+            ids.extend(entry[1])
+
+        return ' '.join(lemmas), ids
+
+    def words(self, ids):
+        """Vocabulary words of token ids, like the tokenizer's index_word"""
+        if self._index_word is None:
+            self._index_word = {index: word for word, index in self.word_index.items()}
+        return [self._index_word.get(int(i), '') for i in ids]
+
+    def pad_into(self, ids, row):
+        """Pre-pad / pre-truncate ids into row, like pad_sequences"""
+        row[:] = 0
+        if ids:
+            ids = ids[-self.max_len:]
+            row[self.max_len - len(ids):] = ids
+        return row
+
+    def encode(self, text, out=None):
+        """Encode one text into a padded int32 row of length max_len"""
+        if out is None:
+            out = np.zeros(self.max_len, dtype=np.int32)
+        cleaned_text, ids = self.tokenize(text)
+        self.pad_into(ids, out)
+        return cleaned_text, out
+
+    def encode_batch(self, texts, out=None):
+        """Encode many texts into one (len(texts), max_len) int32 array"""
+        if out is None:
+            out = np.zeros((len(texts), self.max_len), dtype=np.int32)
+        cleaned_texts = []
+        for i, text in enumerate(texts):
+            cleaned_text, ids = self.tokenize(text)
+            self.pad_into(ids, out[i])
+            cleaned_texts.append(cleaned_text)
+        return cleaned_texts, out
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python text_encoder.py <tokenizer.pickle> <tokenizer_vocab.npy>")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'rb') as handle:
+        tokenizer = pickle.load(handle)
+    save_vocabulary(tokenizer, sys.argv[2])
+    print(f"Vocabulary written to {sys.argv[2]}")
@@ -0,0 +1,79 @@
+"""
+TFLite inference backend for CPU serving.
+
+The quantized models produced by ai-model.py are converted with a fixed
+[1, max_len] input, which is what lets the converter fuse the BiLSTMs into
+native TFLite kernels; a fused model can't be resized to another batch size.
+Each interpreter therefore scores one row per invoke(), and a pool of
+interpreters serves concurrent requests (invoke() releases the GIL).
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def load_interpreter_class():
+    """Prefer the standalone tflite_runtime package, fall back to TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class InterpreterPool:
+    """A fixed set of TFLite interpreters shared by request threads"""
+
+    def __init__(self, model_path, size=2, num_threads=1):
+        Interpreter = load_interpreter_class()
+
+        self.model_path = model_path
+        self.size = max(1, int(size))
+        self._pool = queue.Queue()
+        for _ in range(self.size):
+            interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+            interpreter.allocate_tensors()
+            input_details = interpreter.get_input_details()[0]
+            output_details = interpreter.get_output_details()[0]
+            self._pool.put((interpreter, input_details['index'], output_details['index']))
+
+        self.batch_size, self.seq_len = (int(dim) for dim in input_details['shape'])
+        self._executor = ThreadPoolExecutor(self.size, thread_name_prefix="tflite") if self.size > 1 else None
+
+    def _predict_rows(self, padded_seqs):
+        """Score rows on one interpreter, batch_size rows per invoke()"""
+        n = len(padded_seqs)
+        probabilities = np.empty(n, dtype=np.float32)
+        chunk = np.zeros((self.batch_size, self.seq_len), dtype=np.int32)
+
+        interpreter, input_index, output_index = self._pool.get()
+        try:
+            for start in range(0, n, self.batch_size):
+                rows = padded_seqs[start:start + self.batch_size]
+                chunk[:len(rows)] = rows
+                chunk[len(rows):] = 0
+                interpreter.set_tensor(input_index, chunk)
+                interpreter.invoke()
+                probabilities[start:start + len(rows)] = interpreter.get_tensor(output_index)[:len(rows), 0]
+        finally:
+            self._pool.put((interpreter, input_index, output_index))
+
+        return probabilities
+
+    def predict(self, padded_seqs):
+        """Score a (n, max_len) int array, spreading large batches over the pool"""
+        n = len(padded_seqs)
+        if self._executor is None or n <= self.batch_size:
+            return self._predict_rows(padded_seqs)
+
+        # One contiguous slice per interpreter
+        bounds = np.linspace(0, n, self.size + 1).astype(int)
+        parts = [
+            self._executor.submit(self._predict_rows, padded_seqs[bounds[i]:bounds[i + 1]])
+            for i in range(self.size)
+            if bounds[i] < bounds[i + 1]
+        ]
+        return np.concatenate([part.result() for part in parts])
@@ -0,0 +1,205 @@
+"""
+Asynchronous tweet ingestion for /analyze/url.
+
+A single asyncio event loop runs in a background thread and owns a pooled,
+keep-alive aiohttp session. Flask request threads hand it URLs and wait for
+the result with a strict timeout, so one slow upstream ties up a coroutine
+rather than a worker. Fetches are limited per host, deduplicated while in
+flight and cached on the normalized tweet URL.
+
+Content is fetched from AI_TWEET_FETCH_URL, a template such as
+``https://cdn.syndication.twimg.com/tweet-result?id={status_id}&token=a`` that
+returns tweet JSON. Point it at a local stub server to test without network.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import aiohttp
+
+TWITTER_HOSTS = ('twitter.com', 'x.com')
+_STATUS_PATH = re.compile(r'^/(?:[^/]+/|i/web/)?status(?:es)?/(\d+)')
+
+
+def normalize_tweet_url(url):
+    """Canonical cache key and status id for a tweet URL, or (None, None)"""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower().split(':')[0]
+    for prefix in ('www.', 'mobile.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if host not in TWITTER_HOSTS:
+        return None, None
+
+    match = _STATUS_PATH.match(parsed.path)
+    if not match:
+        return None, None
+    status_id = match.group(1)
+    return f"twitter.com/status/{status_id}", status_id
+
+
+def parse_tweet_payload(payload):
+    """Pull content, author and timestamp out of a tweet JSON payload"""
+    content = payload.get('text') or payload.get('full_text') or payload.get('content')
+    user = payload.get('user') or {}
+    return {
+        "success": True,
+        "content": content,
+        "author": user.get('screen_name') or payload.get('author'),
+        "timestamp": payload.get('created_at') or payload.get('timestamp')
+    }
+
+
+class UrlIngestor:
+    """Pooled async HTTP fetching of tweet content, usable from sync code"""
+
+    def __init__(self, fetch_url_template, timeout=5.0, per_host_limit=8, total_limit=100,
+                 cache_size=10000, cache_ttl=600.0, max_bytes=1 << 20):
+        self.fetch_url_template = fetch_url_template
+        self.timeout = float(timeout)
+        self.per_host_limit = per_host_limit
+        self.total_limit = total_limit
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_bytes = max_bytes
+
+        self._cache = OrderedDict()  # normalized url -> (expires_at, result)
+        self._inflight = {}  # normalized url -> asyncio.Task
+        self._loop = None
+        self._session = None
+        self._thread = None
+        self._started = threading.Event()
+
+        self._fetches = 0
+        self._cache_hits = 0
+        self._errors = 0
+        self._timeouts = 0
+
+    def start(self):
+        """Start the event loop thread and open the HTTP session"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name="url-ingest", daemon=True)
+            self._thread.start()
+            self._started.wait()
+        return self
+
+    def stop(self):
+        """Close the HTTP session and stop the event loop"""
+        if self._thread is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(self.timeout)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(self.timeout)
+            self._thread = None
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        connector = aiohttp.TCPConnector(
+            limit=self.total_limit,
+            limit_per_host=self.per_host_limit,
+            keepalive_timeout=30,
+            ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout, connect=min(self.timeout, 2.0))
+        )
+        self._started.set()
+        self._loop.run_forever()
+
+    def fetch(self, url):
+        """Fetch one tweet; blocks the calling thread for at most the timeout"""
+        return self.fetch_many([url])[0]
+
+    def fetch_many(self, urls):
+        """Fetch many tweets concurrently, returning results in input order"""
+        future = asyncio.run_coroutine_threadsafe(self._fetch_all(urls), self._loop)
+        try:
+            # Every fetch has its own timeout; this is just a safety net
+            return future.result(self.timeout + 1.0)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return [{"error": "Timed out fetching tweet content"} for _ in urls]
+
+    async def _fetch_all(self, urls):
+        return await asyncio.gather(*(self._fetch_one(url) for url in urls))
+
+    async def _fetch_one(self, url):
+        key, status_id = normalize_tweet_url(url) if isinstance(url, str) else (None, None)
+        if key is None:
+            return {"error": "Not a valid Twitter status URL"}
+
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > now:
+            self._cache.move_to_end(key)
+            self._cache_hits += 1
+            return dict(cached[1])
+
+        # Identical URLs submitted together share one request
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._download(key, status_id))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return dict(await asyncio.shield(task))
+
+    async def _download(self, key, status_id):
+        self._fetches += 1
+        try:
+            async with self._session.get(self.fetch_url_template.format(status_id=status_id)) as response:
+                if response.status != 200:
+                    self._errors += 1
+                    return {"error": f"Tweet fetch failed with HTTP {response.status}"}
+                # read(n) returns only what is buffered so far, so collect
+                # chunks until EOF, stopping once the cap is passed
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_any():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        break
+                body = b''.join(chunks)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            return {"error": "Timed out fetching tweet content"}
+        except aiohttp.ClientError as e:
+            self._errors += 1
+            return {"error": f"Error extracting tweet content: {str(e)}"}
+
+        if len(body) > self.max_bytes:
+            self._errors += 1
+            return {"error": "Tweet payload too large"}
+
+        try:
+            result = parse_tweet_payload(json.loads(body))
+        except (ValueError, AttributeError):
+            self._errors += 1
+            return {"error": "Invalid tweet payload"}
+        if not result["content"]:
+            self._errors += 1
+            return {"error": "Tweet has no text content"}
+
+        self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def stats(self):
+        """Fetch counters for /health"""
+        return {
+            "fetches": self._fetches,
+            "cache_hits": self._cache_hits,
+            "cache_entries": len(self._cache),
+            "inflight": len(self._inflight),
+            "errors": self._errors,
+            "timeouts": self._timeouts
+        }
@@ -0,0 +1,223 @@
+"""
+Verdict cache for repeated inputs.
+
+Results are keyed on a hash of the cleaned text and the model version. The
+in-process tier is an LRU with a TTL; identical requests that arrive while a
+result is being computed wait for it instead of running another forward pass.
+An optional SQLite tier lets every worker process on a host share hits.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def make_cache_key(cleaned_text, model_version, variant=""):
+    """Hash the cleaned text together with the model version"""
+    raw = f"{model_version}\0{variant}\0{cleaned_text}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class SharedVerdictStore:
+    """SQLite-backed cache tier shared by all worker processes on a host"""
+
+    def __init__(self, path, ttl_seconds, max_entries=100000, prune_every=1000):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS verdicts_expires ON verdicts (expires_at)")
+        conn.commit()
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM verdicts WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO verdicts (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl),
+        )
+
+        with self._writes_lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drop expired rows and keep the table under max_entries"""
+        conn = self._connection()
+        conn.execute("DELETE FROM verdicts WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM verdicts WHERE key IN ("
+            "SELECT key FROM verdicts ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class VerdictCache:
+    """LRU + TTL result cache with in-flight request deduplication"""
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600, shared_path=None, shared_max_entries=100000):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.shared = (
+            SharedVerdictStore(shared_path, self.ttl, shared_max_entries) if shared_path else None
+        )
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._inflight_waits = 0
+        self._evictions = 0
+        self._shared_errors = 0
+
+    def _get_local(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _put_local(self, key, value, now):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def get(self, key):
+        """Look a key up in the local tier, then the shared tier"""
+        now = time.time()
+        with self._lock:
+            value = self._get_local(key, now)
+            if value is not None:
+                self._hits += 1
+                return value
+
+        value = self._get_shared(key)
+        with self._lock:
+            if value is not None:
+                self._shared_hits += 1
+                self._put_local(key, value, now)
+            else:
+                self._misses += 1
+        return value
+
+    def put(self, key, value):
+        """Store a result in both tiers"""
+        with self._lock:
+            self._put_local(key, value, time.time())
+        self._put_shared(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing it at most once at a time"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            # Another thread may have stored it since the lookup above
+            value = self._get_local(key, time.time())
+            if value is not None:
+                return value
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._inflight_waits += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            # Store before leaving the in-flight map, so a caller arriving in
+            # between finds the value instead of computing it again
+            self.put(key, value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+        future.set_result(value)
+        return value
+
+    def _get_shared(self, key):
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(key)
+        except sqlite3.Error:
+            with self._lock:
+                self._shared_errors += 1
+            return None
+
+    def _put_shared(self, key, value):
+        if self.shared is None:
+            return
+        try:
+            self.shared.put(key, value)
+        except sqlite3.Error:
+            with self._lock:
+                self._shared_errors += 1
+
+    def stats(self):
+        """Hit/miss counters for /health"""
+        with self._lock:
+            lookups = self._hits + self._shared_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "shared_hits": self._shared_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._hits + self._shared_hits) / lookups, 4) if lookups else 0.0,
+                "inflight": len(self._inflight),
+                "inflight_waits": self._inflight_waits,
+                "evictions": self._evictions,
+                "shared_tier": self.shared.path if self.shared is not None else None,
+                "shared_errors": self._shared_errors,
+            }